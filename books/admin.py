@@ -32,4 +32,5 @@ class BookAdmin(ImportExportModelAdmin):
     list_display = ('title', 'author', 'category', 'available', 'total_copies', 'school')
     list_filter = ('category', 'school')
     search_fields = ('title', 'author', 'isbn', 'category__name')
-    list_editable = ('available',)
\ No newline at end of file
+    list_editable = ('available',)
+    list_select_related = ('category', 'school')
\ No newline at end of file
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from books.models import Book
+from books.stock import release, reserve
+from schools.models import School
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure books.stock throughput: several threads reserve copies of one scratch "
+        "book concurrently. Run against Postgres; correctness is covered by "
+        "books.tests.StockConcurrencyTests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', help="School (short code) to create the scratch book in. Defaults to the first school.")
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent workers.")
+        parser.add_argument('--copies', type=int, default=500, help="Copies on the shelf at the start.")
+        parser.add_argument('--attempts', type=int, default=200, help="Reservations each worker attempts.")
+
+    def handle(self, *args, **options):
+        schools = School.objects.all()
+        if options['school']:
+            schools = schools.filter(short_name__iexact=options['school'])
+        school = schools.order_by('id').first()
+        if school is None:
+            raise CommandError("No school to create the scratch book in.")
+
+        copies = options['copies']
+        book = Book.objects.create(
+            title="Stock stress test", author="-", school=school,
+            total_copies=copies, available=copies,
+        )
+        reserved = [0] * options['threads']
+        errors = []
+        start = threading.Barrier(options['threads'])
+
+        def worker(index):
+            try:
+                start.wait()
+                for _ in range(options['attempts']):
+                    if reserve({book.id: 1}):
+                        reserved[index] += 1
+            except Exception as exc:  # reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        book.refresh_from_db(fields=['available'])
+        issued = sum(reserved)
+        attempts = options['threads'] * options['attempts']
+
+        # Put the copies back so deleting the book leaves the stats unchanged.
+        release({book.id: copies - book.available})
+        book.delete()
+
+        for exc in errors[:5]:
+            self.stderr.write(f"worker error: {exc!r}")
+        self.stdout.write(
+            f"{attempts} reservations in {elapsed:.2f}s ({attempts / elapsed:.0f}/s) "
+            f"by {options['threads']} threads: {issued} of {copies} copies issued."
+        )
+        if errors:
+            raise CommandError(f"{len(errors)} worker(s) failed.")
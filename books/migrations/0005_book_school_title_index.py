@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['school', 'title', 'id'], name='book_school_title_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
+from core.search import trigram_index
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -37,8 +39,16 @@ class Book(models.Model):
     publication_year = models.PositiveIntegerField(null=True, blank=True)
     description = models.TextField(blank=True)
 
+    SEARCH_FIELDS = ('title', 'author', 'isbn')
+
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['school', 'title', 'id'], name='book_school_title_idx'),
+            trigram_index('title', 'book_title_trgm'),
+            trigram_index('author', 'book_author_trgm'),
+            trigram_index('isbn', 'book_isbn_trgm'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.author})"
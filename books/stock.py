@@ -0,0 +1,79 @@
+"""
+Atomic stock counters for Book.
+
+Circulation changes `Book.available` / `Book.total_copies` only through
+reserve(), release() and write_off(). Each takes {book_id: copies} and
+is a single conditional `UPDATE ... RETURNING` over all the books
+involved: the row update itself checks that the copies exist, so two
+desks issuing the same book concurrently can neither oversell it nor
+lose an update, and nothing has to be read or locked beforehand.
+
+Books whose condition fails are left untouched and are missing from the
+result. Like queryset.update(), these bypass the model signals; callers
+account for the SchoolStats deltas (see schools.stats).
+
+A refused release() means the loans say more copies are out than the
+counters do; it is logged to `books.stock` (fix the book's counts in the
+admin and run rebuild_school_stats).
+"""
+import logging
+
+from django.db import connection
+
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+
+def _update(counts, assignment, condition):
+    counts = {book_id: n for book_id, n in counts.items() if n > 0}
+    if not counts:
+        return {}
+
+    table = connection.ops.quote_name(Book._meta.db_table)
+    rows = ', '.join(['(%s, %s)'] * len(counts))
+    params = [value for book_id, n in counts.items() for value in (book_id, n)]
+    # VALUES columns are called column1, column2 on both Postgres and SQLite.
+    sql = (
+        f"UPDATE {table} SET {assignment} "
+        f"FROM (VALUES {rows}) AS stock "
+        f"WHERE {table}.id = stock.column1 AND {condition} "
+        f"RETURNING {table}.id, {table}.available"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(cursor.fetchall())
+
+
+def reserve(counts):
+    """
+    Take copies off the shelf for new loans. A book is only updated if
+    all of its requested copies are available. Returns {book_id: copies
+    left available} for the books reserved.
+    """
+    return _update(counts, 'available = available - stock.column2', 'available >= stock.column2')
+
+
+def release(counts):
+    """
+    Put copies back on the shelf (returns). A book is only updated if
+    that does not take it over its total_copies. Returns {book_id: copies
+    available} for the books released; the others are logged.
+    """
+    released = _update(counts, 'available = available + stock.column2', 'available + stock.column2 <= total_copies')
+    refused = {book_id: n for book_id, n in counts.items() if n > 0 and book_id not in released}
+    if refused:
+        logger.error(
+            "Stock not released, the copies would exceed total_copies: %s",
+            ', '.join(f"book {book_id} x{n}" for book_id, n in sorted(refused.items())),
+        )
+    return released
+
+
+def write_off(counts):
+    """
+    Remove copies that are out on loan (lost) from the stock for good.
+    A book is only updated if at least that many copies are out. Returns
+    {book_id: copies available} for the books written off.
+    """
+    return _update(counts, 'total_copies = total_copies - stock.column2', 'total_copies - available >= stock.column2')
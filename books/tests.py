@@ -1,3 +1,129 @@
-from django.test import TestCase
+import threading
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.benchmark import QueryBudgetTestMixin
+from core.seeding import seed_schools
+from .models import Book
+from .stock import release, reserve
+
+
+class BookViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Book search pages."""
+    target_prefixes = ('books:',)
+
+
+class BookSearchScopeTests(TestCase):
+    """Book search only ever shows the signed-in user's school."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, cls.librarian), (cls.other_school, _)] = seed_schools(
+            2, classes=1, students_per_class=1, books=3, years=1, loans_per_student=0,
+        )
+
+    def search(self, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        return self.client.get(reverse('books:search'))
+
+    def test_anonymous_redirected_to_login(self):
+        self.assertEqual(self.search().status_code, 302)
+
+    def test_librarian_sees_own_school(self):
+        books = list(self.search(self.librarian).context['books'])
+        self.assertEqual({book.school_id for book in books}, {self.school.pk})
+
+    def test_user_without_school_sees_nothing(self):
+        user = get_user_model().objects.create_user('no-school', password='x')
+        self.assertEqual(list(self.search(user).context['books']), [])
+
+
+# SQLite's shared in-memory test database locks whole tables against
+# concurrent writers.
+@skipUnless(connection.vendor == 'postgresql', "concurrent writers need PostgreSQL")
+class StockConcurrencyTests(TransactionTestCase):
+    """Concurrent reservations of one book never oversell it or lose an update."""
+    threads = 8
+    attempts = 25
+    copies = 120
+
+    def setUp(self):
+        [(school, _)] = seed_schools(1, classes=1, students_per_class=1, books=1, years=1, loans_per_student=0)
+        self.book = Book.objects.create(
+            title='Stock stress test', author='-', school=school,
+            total_copies=self.copies, available=self.copies,
+        )
+
+    def run_workers(self, work):
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def worker(index):
+            try:
+                start.wait()
+                work(index)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_no_oversell(self):
+        reserved = [0] * self.threads
+
+        def work(index):
+            for _ in range(self.attempts):
+                if reserve({self.book.pk: 1}):
+                    reserved[index] += 1
+
+        self.run_workers(work)
+        self.book.refresh_from_db()
+        # More attempts than copies: every copy goes out exactly once.
+        self.assertEqual(sum(reserved), self.copies)
+        self.assertEqual(self.book.available, 0)
+
+    def test_release_never_exceeds_total(self):
+        reserve({self.book.pk: self.copies // 2})
+        released = [0] * self.threads
+
+        def work(index):
+            for _ in range(self.attempts):
+                if release({self.book.pk: 1}):
+                    released[index] += 1
+
+        with self.assertLogs('books.stock', 'ERROR'):
+            self.run_workers(work)
+        self.book.refresh_from_db()
+        self.assertEqual(sum(released), self.copies // 2)
+        self.assertEqual(self.book.available, self.copies)
+
+
+@skipUnless(connection.vendor == 'postgresql', "trigram indexes need PostgreSQL")
+class SearchIndexMigrationTests(TestCase):
+    """The test database is built by `migrate`; the search migrations leave real trigram indexes behind."""
+    indexes = {
+        'book_title_trgm', 'book_author_trgm', 'book_isbn_trgm',
+        'student_name_trgm', 'student_student_id_trgm', 'student_email_trgm', 'student_roll_number_trgm',
+    }
+
+    def test_trigram_indexes_created(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE indexname = ANY(%s)", [sorted(self.indexes)],
+            )
+            found = dict(cursor.fetchall())
+        self.assertEqual(set(found), self.indexes)
+        for name, definition in found.items():
+            self.assertIn('USING gin', definition, name)
+            self.assertIn('gin_trgm_ops', definition, name)
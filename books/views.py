@@ -1,9 +1,21 @@
+from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
+from core.pagination import keyset_page
+from core.search import search
 from .models import Book
 
+SEARCH_RESULT_FIELDS = ('id', 'title', 'author', 'isbn', 'category__name', 'total_copies', 'available')
+
+@login_required
 def book_search(request):
+    """Search the signed-in user's school catalogue; users without a school find nothing."""
     query = request.GET.get('q', '')
-    books = Book.objects.all()
-    if query:
-        books = books.filter(title__icontains=query) | books.filter(author__icontains=query) | books.filter(isbn__icontains=query)
-    return render(request, 'books/search.html', {'books': books, 'query': query})
\ No newline at end of file
+    if request.school is None:
+        books = Book.objects.none()
+    else:
+        books = Book.objects.filter(school=request.school).select_related('category').only(*SEARCH_RESULT_FIELDS)
+    if query.strip():
+        books = search(books, query, Book.SEARCH_FIELDS)
+    else:
+        books = keyset_page(request, books, ('title', 'id'))
+    return render(request, 'books/search.html', {'books': books, 'query': query})
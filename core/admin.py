@@ -10,12 +10,8 @@ class SchoolFilteredAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs  # Superuser sees everything
-        # For normal users: filter by their assigned school
-        try:
-            profile = request.user.school_profile
-            if profile.school:
-                return qs.filter(school=profile.school)
-        except AttributeError:
-            pass
+        # For normal users: filter by their assigned school (set by SchoolContextMiddleware)
+        if getattr(request, 'school', None) is not None:
+            return qs.filter(school=request.school)
         # If no profile or no school → show nothing
         return qs.none()
\ No newline at end of file
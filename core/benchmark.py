@@ -0,0 +1,304 @@
+"""
+Per-view benchmark harness and query budgets.
+
+view_targets() lists one request for every page of students.views,
+books.views and transactions.views plus the admin changelists and custom
+admin views, for a school seeded by core.seeding. measure() runs a target
+with a cold cache (the worst case) and then warm, recording query counts,
+p50 / p95 latency and peak Python memory.
+
+QUERY_BUDGETS is the checked-in maximum number of queries of the cold
+request. Only statements that touch data count: the django_tenants
+backend sends a `SET search_path` ahead of queries, which would double
+every count without saying anything about the view, so SET statements
+are left out (counted_queries()). The per-app tests (QueryBudgetTestMixin) enforce it on seeded
+data large enough that a per-row query (N+1) goes over budget;
+`manage.py benchmark_views` reports the same numbers at several data
+scales.
+
+measure_import() times a student CSV import (students.importing) of a
+generated file; `manage.py benchmark_import` runs it at 50k rows.
+
+Not covered: students:student_dashboard (looks students up by a `user`
+field Student does not have) and transactions:overdue_report (its
+template does not exist).
+"""
+import csv
+import io
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from books.models import Book
+from core.seeding import SCALES, seed_schools
+from students.importing import IMPORT_BATCH_SIZE, StudentImporter
+from students.models import ClassGroup, Student
+from transactions.exports import EXPORT_BATCH_SIZE
+from transactions.models import BorrowTransaction, LoanHistory
+
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Celery reads its configuration from the CELERY_ settings, so the report
+# and import tasks run inline (and raise) under override_settings.
+BENCHMARK_CELERY = {'CELERY_TASK_ALWAYS_EAGER': True, 'CELERY_TASK_EAGER_PROPAGATES': True}
+
+# Every request also spends queries on the session and the user (2), and
+# cold, on the school context (1). The exports read their rows in batches
+# and get one more query per EXPORT_BATCH_SIZE loans.
+QUERY_BUDGETS = {
+    'students:librarian_dashboard': 8,
+    'students:librarian_dashboard?range=year': 8,
+    'students:student_search': 5,
+    'students:student_list': 4,
+    'students:add_book': 4,
+    'students:issue_book': 5,
+    'students:issue_book POST': 13,
+    'students:return_book': 4,
+    'students:returns_list': 5,
+    'students:bulk_return POST': 12,
+    'students:reports_overview': 5,
+    'students:report_pdf overdue': 5,
+    'students:report_pdf stock': 5,
+    'students:librarian_settings': 3,
+    'students:class_lists_overview': 4,
+    'students:class_detail': 5,
+    'students:library_stock': 6,
+    'students:import_students': 3,
+    'books:search': 4,
+    'books:search?q': 4,
+    'transactions:export_loans csv': 4,
+    'transactions:export_loans xlsx': 4,
+    'admin:schools_school_changelist': 6,
+    'admin:schools_userschoolprofile_changelist': 7,
+    'admin:students_student_changelist': 8,
+    'admin:students_classgroup_changelist': 7,
+    'admin:students_importjob_changelist': 7,
+    'admin:student_batch_import': 4,
+    'admin:books_book_changelist': 8,
+    'admin:books_category_changelist': 6,
+    'admin:transactions_borrowtransaction_changelist': 9,
+    'admin:overdue_report': 6,
+}
+
+
+@dataclass
+class Target:
+    name: str
+    url: str
+    method: str = 'get'
+    data: dict = field(default_factory=dict)
+    admin: bool = False
+    extra_queries: int = 0
+
+    @property
+    def budget(self):
+        return QUERY_BUDGETS[self.name] + self.extra_queries
+
+
+def view_targets(school):
+    """The requests to measure for `school` (seeded by core.seeding), keyed like QUERY_BUDGETS."""
+    class_group = ClassGroup.objects.filter(school=school).order_by('id').first()
+    student = Student.objects.filter(school=school).order_by('id').first()
+    loans = BorrowTransaction.objects.filter(school=school).active().order_by('id')
+    loan = loans.first()
+    book_ids = list(Book.objects.filter(school=school, available__gt=0).values_list('id', flat=True)[:3])
+    export_batches = LoanHistory.objects.filter(school=school).count() // EXPORT_BATCH_SIZE
+    return [
+        Target('students:librarian_dashboard', reverse('students:librarian_dashboard')),
+        Target('students:librarian_dashboard?range=year', reverse('students:librarian_dashboard') + '?range=year'),
+        Target('students:student_search', reverse('students:student_search') + '?q=a'),
+        Target('students:student_list', reverse('students:student_list')),
+        Target('students:add_book', reverse('students:add_book')),
+        Target('students:issue_book', reverse('students:issue_book')),
+        Target('students:issue_book POST', reverse('students:issue_book'), 'post', {
+            'student_id': student.pk,
+            'due_date': f'{timezone.localdate() + timedelta(days=14):%Y-%m-%d}',
+            **{f'qty_{book_id}': 1 for book_id in book_ids},
+        }),
+        Target('students:return_book', reverse('students:return_book', args=[loan.pk])),
+        Target('students:returns_list', reverse('students:returns_list')),
+        Target('students:bulk_return POST', reverse('students:bulk_return'), 'post', {
+            'borrow_ids': [str(pk) for pk in loans.values_list('id', flat=True)[1:21]],
+        }),
+        Target('students:reports_overview', reverse('students:reports_overview')),
+        Target('students:report_pdf overdue', reverse('students:report_pdf', args=['overdue'])),
+        Target('students:report_pdf stock', reverse('students:report_pdf', args=['stock'])),
+        Target('students:librarian_settings', reverse('students:librarian_settings')),
+        Target('students:class_lists_overview', reverse('students:class_lists_overview')),
+        Target('students:class_detail', reverse('students:class_detail', args=[class_group.pk])),
+        Target('students:library_stock', reverse('students:library_stock')),
+        Target('students:import_students', reverse('students:import_students')),
+        Target('books:search', reverse('books:search')),
+        Target('books:search?q', reverse('books:search') + '?q=river'),
+        Target('transactions:export_loans csv', reverse('transactions:export_loans', args=['csv']),
+               extra_queries=export_batches),
+        Target('transactions:export_loans xlsx', reverse('transactions:export_loans', args=['xlsx']),
+               extra_queries=export_batches),
+        *[Target(name, reverse(name), admin=True) for name in (
+            'admin:schools_school_changelist',
+            'admin:schools_userschoolprofile_changelist',
+            'admin:students_student_changelist',
+            'admin:students_classgroup_changelist',
+            'admin:students_importjob_changelist',
+            'admin:student_batch_import',
+            'admin:books_book_changelist',
+            'admin:books_category_changelist',
+            'admin:transactions_borrowtransaction_changelist',
+            'admin:overdue_report',
+        )],
+    ]
+
+
+def counted_queries(captured):
+    """Number of statements in a CaptureQueriesContext, leaving out the backend's SET statements."""
+    return sum(1 for query in captured.captured_queries if not query['sql'].lstrip().upper().startswith('SET '))
+
+
+def request(client, target):
+    """Send `target` and consume a streamed body. Returns (response, queries)."""
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, target.method)(target.url, target.data)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    return response, counted_queries(queries)
+
+
+def percentile(values, pct):
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1] if len(values) > 1 else values[0]
+
+
+def measure(client, target, iterations=10):
+    """
+    Cold request (cache cleared, so only run this against a throwaway
+    local-memory cache) followed by `iterations` warm ones.
+    Returns a dict of status, cold / warm query counts, p50 / p95 latency
+    (ms, warm) and peak traced memory (KB).
+    """
+    cache.clear()
+    tracemalloc.start()
+    try:
+        response, cold_queries = request(client, target)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    warm_queries = cold_queries
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _, warm_queries = request(client, target)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'status': response.status_code,
+        'queries': cold_queries,
+        'warm_queries': warm_queries,
+        'p50_ms': percentile(timings, 50) if timings else None,
+        'p95_ms': percentile(timings, 95) if timings else None,
+        'peak_kb': peak / 1024,
+        'budget': target.budget,
+    }
+
+
+def run_targets(school, librarian, superuser, iterations=10):
+    """Yield (target, measure() result) for every target of `school`."""
+    librarian_client = Client()
+    librarian_client.force_login(librarian)
+    admin_client = Client()
+    admin_client.force_login(superuser)
+    for target in view_targets(school):
+        yield target, measure(admin_client if target.admin else librarian_client, target, iterations)
+
+
+def student_csv(school, rows):
+    """An in-memory student import file of `rows` new students spread over `school`'s classes."""
+    classes = list(ClassGroup.objects.filter(school=school).order_by('id').values_list('name', flat=True))
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(['student_id', 'name', 'class_group', 'gender', 'admission_date'])
+    for n in range(rows):
+        writer.writerow([f'{school.short_name}-IMP{n:07d}', f'Imported Student {n}', classes[n % len(classes)],
+                         'F' if n % 2 else 'M', '2024-01-15'])
+    return io.BytesIO(text.getvalue().encode())
+
+
+def measure_import(school, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import a generated file of `rows` students into `school` the way an
+    ImportJob does (run_in_batches). Returns a dict of rows, created,
+    queries, seconds, rows per second and peak traced memory (KB, the
+    file itself excluded).
+    """
+    upload = student_csv(school, rows)
+    importer = StudentImporter(school, batch_size=batch_size)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            result = importer.run_in_batches(upload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = time.perf_counter() - started
+    return {
+        'rows': result.rows,
+        'created': result.created,
+        'queries': counted_queries(queries),
+        'seconds': seconds,
+        'rows_per_s': result.rows / seconds if seconds else None,
+        'peak_kb': peak / 1024,
+    }
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin: every target whose name starts with one of
+    `target_prefixes` answers without an error and within its query budget,
+    on a school seeded at `scale`, cold cache.
+    """
+    target_prefixes = ()
+    scale = 'small'
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._settings = override_settings(CACHES=BENCHMARK_CACHES, MEDIA_ROOT=cls._media_root, **BENCHMARK_CELERY)
+        cls._settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._settings.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, cls.librarian)] = seed_schools(1, **SCALES[cls.scale])
+        cls.superuser = get_user_model().objects.create_superuser('budget-admin', password='budget')
+
+    def test_views_within_query_budget(self):
+        librarian_client = Client()
+        librarian_client.force_login(self.librarian)
+        admin_client = Client()
+        admin_client.force_login(self.superuser)
+        targets = [target for target in view_targets(self.school) if target.name.startswith(self.target_prefixes)]
+        self.assertTrue(targets)
+        for target in targets:
+            with self.subTest(target.name):
+                cache.clear()
+                response, queries = request(admin_client if target.admin else librarian_client, target)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(queries, target.budget)
@@ -0,0 +1,196 @@
+"""
+Opt-in per-request SQL and timing instrumentation.
+
+Enabled by SQL_INSTRUMENTATION (settings / environment); otherwise
+SQLInstrumentationMiddleware removes itself at startup. While a request
+is handled every database connection is wrapped with
+connection.execute_wrapper(), which times each statement and records its
+fingerprint: the SQL with literals, placeholders and IN / VALUES lists
+collapsed, so the same query with different arguments counts as one.
+For each request the middleware
+
+- adds a Server-Timing header (`sql` and `app` durations, query count)
+  that browser dev tools show next to the request;
+- logs one JSON line on the `core.instrumentation` logger when the
+  request took longer than SLOW_REQUEST_MS, ran a statement slower than
+  SLOW_QUERY_MS, or ran the same fingerprint DUPLICATE_QUERY_THRESHOLD
+  times or more (the N+1 signature);
+- adds the request to per-view totals kept in the shared cache, so the
+  numbers of all worker processes add up. Staff read them at
+  sql_instrumentation_summary (JSON, slowest views first).
+
+Queries made while a streaming response is consumed run after the
+middleware has returned and are not counted.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+SQL_INSTRUMENTATION = getattr(settings, 'SQL_INSTRUMENTATION', False)
+# Thresholds (milliseconds / repetitions) above which a request is logged.
+SLOW_REQUEST_MS = getattr(settings, 'SLOW_REQUEST_MS', 500)
+SLOW_QUERY_MS = getattr(settings, 'SLOW_QUERY_MS', 100)
+DUPLICATE_QUERY_THRESHOLD = getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 5)
+# How many of the slowest statements a log line includes, and how much of each.
+SLOWEST_QUERIES_LOGGED = 3
+LOGGED_SQL_LENGTH = 300
+
+STATS_FIELDS = ('requests', 'queries', 'sql_us', 'total_us', 'slow', 'duplicates')
+STATS_VIEWS_KEY = 'core:sql-stats:views'
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """`sql` with its literals replaced by ? and lists of them collapsed to (...)."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps (fingerprint, ms) for every statement run."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((fingerprint(sql), (time.perf_counter() - started) * 1000))
+
+    @property
+    def sql_ms(self):
+        return sum(ms for _, ms in self.queries)
+
+    def slowest(self, n=SLOWEST_QUERIES_LOGGED):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:n]
+
+    def duplicates(self, threshold=DUPLICATE_QUERY_THRESHOLD):
+        """{fingerprint: count} for the statements run at least `threshold` times."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.most_common() if count >= threshold}
+
+
+def _count(key, value):
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        if not cache.add(key, value, None):
+            cache.incr(key, value)
+
+
+_registered_views = set()
+
+
+def record_view_stats(view_name, **values):
+    """Add one request's numbers (STATS_FIELDS) to the shared totals of `view_name`."""
+    if view_name not in _registered_views:
+        views = cache.get(STATS_VIEWS_KEY) or set()
+        if view_name not in views:
+            cache.set(STATS_VIEWS_KEY, views | {view_name}, None)
+        _registered_views.add(view_name)
+    for field in STATS_FIELDS:
+        if values.get(field):
+            _count(f'core:sql-stats:{view_name}:{field}', int(values[field]))
+
+
+def view_stats():
+    """{view name: {field: total}} for every view recorded so far."""
+    views = sorted(cache.get(STATS_VIEWS_KEY) or ())
+    values = cache.get_many([f'core:sql-stats:{view}:{field}' for view in views for field in STATS_FIELDS])
+    return {
+        view: {field: values.get(f'core:sql-stats:{view}:{field}', 0) for field in STATS_FIELDS}
+        for view in views
+    }
+
+
+class SQLInstrumentationMiddleware:
+    """Put it first in MIDDLEWARE so session and auth queries are counted too."""
+
+    def __init__(self, get_response):
+        if not SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        sql_ms = recorder.sql_ms
+        response.headers['Server-Timing'] = ', '.join(filter(None, [
+            response.headers.get('Server-Timing'),
+            f'sql;dur={sql_ms:.1f};desc="{len(recorder.queries)} queries"',
+            f'app;dur={total_ms:.1f}',
+        ]))
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        slowest = recorder.slowest()
+        duplicates = recorder.duplicates()
+        slow = total_ms > SLOW_REQUEST_MS or (slowest and slowest[0][1] > SLOW_QUERY_MS)
+        if slow or duplicates:
+            logger.warning(json.dumps({
+                'event': 'slow_request' if slow else 'duplicate_queries',
+                'view': view_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'sql_ms': round(sql_ms, 1),
+                'queries': len(recorder.queries),
+                'slowest': [{'sql': sql[:LOGGED_SQL_LENGTH], 'ms': round(ms, 1)} for sql, ms in slowest],
+                'duplicates': [{'sql': sql[:LOGGED_SQL_LENGTH], 'count': count} for sql, count in duplicates.items()],
+            }))
+
+        record_view_stats(
+            view_name,
+            requests=1,
+            queries=len(recorder.queries),
+            sql_us=sql_ms * 1000,
+            total_us=total_ms * 1000,
+            slow=bool(slow),
+            duplicates=bool(duplicates),
+        )
+        return response
+
+
+@staff_member_required
+def sql_instrumentation_summary(request):
+    """Per-view averages of the recorded requests, slowest total time first."""
+    summary = []
+    for view, stats in view_stats().items():
+        requests = stats['requests'] or 1
+        summary.append({
+            'view': view,
+            'requests': stats['requests'],
+            'avg_queries': round(stats['queries'] / requests, 1),
+            'avg_sql_ms': round(stats['sql_us'] / requests / 1000, 1),
+            'avg_total_ms': round(stats['total_us'] / requests / 1000, 1),
+            'total_ms': round(stats['total_us'] / 1000, 1),
+            'slow_requests': stats['slow'],
+            'requests_with_duplicates': stats['duplicates'],
+        })
+    summary.sort(key=lambda row: row['total_ms'], reverse=True)
+    return JsonResponse({'enabled': SQL_INSTRUMENTATION, 'views': summary})
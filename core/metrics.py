@@ -0,0 +1,252 @@
+"""
+Prometheus metrics, aggregated in the shared cache.
+
+Gunicorn and Celery run several processes, so in-process counters would
+each see only part of the traffic. Every sample here is an integer
+counter in the shared (Redis) cache, updated with the atomic
+cache.incr(), and the `/metrics` view renders the totals of all
+processes in the Prometheus text format. Histograms keep one counter per
+bucket plus their sum in fixed-point units (`scale` per unit). Updates
+made inside a transaction are applied once it commits, so work that is
+rolled back is not counted.
+
+Each metric keeps the label values it has seen under one more cache key.
+A process checks that its label values are listed there the first time
+it uses them and again every SERIES_RECHECK_SECONDS, which restores a
+series lost to two processes registering at once.
+
+MetricsMiddleware records request latency and database queries per URL
+name. Disable everything with METRICS_ENABLED = False.
+"""
+import hmac
+import math
+import time
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.http import HttpResponse, HttpResponseForbidden
+
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+# Bearer token Prometheus sends to /metrics; staff users may read it without one.
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+SERIES_RECHECK_SECONDS = 60
+
+METRICS = []
+
+
+def _incr(key, amount):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, (float, Decimal)) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._checked = {}
+        METRICS.append(self)
+
+    @property
+    def series_key(self):
+        return f'core:metrics:{self.name}:series'
+
+    def _values(self, labels):
+        values = tuple(str(labels[label]) for label in self.labels)
+        now = time.monotonic()
+        if now - self._checked.get(values, -SERIES_RECHECK_SECONDS) >= SERIES_RECHECK_SECONDS:
+            series = cache.get(self.series_key) or set()
+            if values not in series:
+                cache.set(self.series_key, series | {values}, None)
+            self._checked[values] = now
+        return values
+
+    def _key(self, values, suffix):
+        return f'core:metrics:{self.name}:{suffix}:' + '|'.join(values)
+
+    def _update(self, updates):
+        if METRICS_ENABLED:
+            transaction.on_commit(lambda: [_incr(key, amount) for key, amount in updates if amount])
+
+    def series(self):
+        return sorted(cache.get(self.series_key) or ())
+
+    def samples(self):
+        """[(sample name, [(label, value)], value)] read from the cache."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        for name, pairs, value in self.samples():
+            lines.append(f'{name}{_format_labels(pairs)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        amount = int(amount)
+        if amount > 0:
+            self._update([(self._key(self._values(labels), 'value'), amount)])
+
+    def values(self):
+        """{label values: total} for every series."""
+        series = self.series()
+        stored = cache.get_many([self._key(values, 'value') for values in series])
+        return {values: stored.get(self._key(values, 'value'), 0) for values in series}
+
+    def samples(self):
+        return [
+            (self.name, list(zip(self.labels, values)), total)
+            for values, total in self.values().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets, labels=(), scale=1):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.scale = scale
+
+    def observe(self, value, **labels):
+        values = self._values(labels)
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        self._update([
+            (self._key(values, f'bucket:{bucket}'), 1),
+            (self._key(values, 'sum'), round(value * self.scale)),
+        ])
+
+    def samples(self):
+        series = self.series()
+        keys = [self._key(values, suffix) for values in series
+                for suffix in ['sum', *(f'bucket:{bound}' for bound in self.buckets)]]
+        stored = cache.get_many(keys)
+        samples = []
+        for values in series:
+            pairs = list(zip(self.labels, values))
+            count = 0
+            for bound in self.buckets:
+                count += stored.get(self._key(values, f'bucket:{bound}'), 0)
+                samples.append((f'{self.name}_bucket', pairs + [('le', _format_value(bound))], count))
+            samples.append((f'{self.name}_sum', pairs, stored.get(self._key(values, 'sum'), 0) / self.scale))
+            samples.append((f'{self.name}_count', pairs, count))
+        return samples
+
+
+class Gauge(Metric):
+    """Computed when scraped: `collect()` returns [(label values, value)]."""
+    kind = 'gauge'
+
+    def __init__(self, name, description, collect, labels=()):
+        super().__init__(name, description, labels)
+        self.collect = collect
+
+    def samples(self):
+        return [(self.name, list(zip(self.labels, values)), value) for values, value in self.collect()]
+
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+LOANS_ISSUED = Counter('library_loans_issued_total', "Loans issued.")
+LOANS_RETURNED = Counter('library_loans_returned_total', "Loans returned.")
+LOANS_RENEWED = Counter('library_loans_renewed_total', "Loans renewed.")
+LOANS_OVERDUE = Counter('library_loans_overdue_total', "Loans that became overdue.")
+FINES_ACCRUED = Counter('library_fines_accrued_ugx_total', "Late fines charged on return, in UGX.")
+ISSUE_BATCH = Histogram('library_issue_batch_loans', "Loans created per issue request.", BATCH_BUCKETS)
+RETURN_BATCH = Histogram('library_return_batch_loans', "Loans closed per return request.", BATCH_BUCKETS)
+IMPORTS = Counter('library_imports_total', "Finished student import jobs.", labels=('status',))
+ROWS_IMPORTED = Counter('library_import_rows_total', "Student import rows processed.", labels=('result',))
+IMPORT_DURATION = Histogram(
+    'library_import_duration_seconds', "Student import jobs, from upload to finish.",
+    (1, 5, 15, 60, 300, 900, 3600), scale=1000,
+)
+REQUEST_DURATION = Histogram(
+    'library_http_request_duration_seconds', "Request latency per URL name.",
+    LATENCY_BUCKETS, labels=('view', 'method'), scale=1_000_000,
+)
+DB_QUERIES = Counter('library_db_queries_total', "Database queries per URL name.", labels=('view',))
+CACHE_REQUESTS = Counter('library_cache_requests_total', "Cache lookups.", labels=('cache', 'result'))
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (name, result), count in CACHE_REQUESTS.values().items():
+        hits, lookups = totals.get(name, (0, 0))
+        totals[name] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return [((name,), hits / lookups) for name, (hits, lookups) in sorted(totals.items()) if lookups]
+
+
+CACHE_HIT_RATIO = Gauge('library_cache_hit_ratio', "Share of cache lookups that hit.", _cache_hit_ratios, labels=('cache',))
+
+
+def record_cache_lookup(name, hit):
+    CACHE_REQUESTS.inc(cache=name, result='hit' if hit else 'miss')
+
+
+def render_metrics():
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+class MetricsMiddleware:
+    """Request latency and query count per URL name; put it near the top of MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        if not METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name != 'metrics':
+            REQUEST_DURATION.observe(time.perf_counter() - started, view=match.view_name, method=request.method)
+            DB_QUERIES.inc(queries, view=match.view_name)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: `Authorization: Bearer <METRICS_TOKEN>`, or a staff session."""
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {METRICS_TOKEN}')
+    if not token_ok and not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
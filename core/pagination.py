@@ -0,0 +1,144 @@
+"""
+Keyset (seek) pagination for long list pages.
+
+Instead of OFFSET and a COUNT(*), each page remembers the ordering values
+of its first and last rows in an opaque cursor and the next page starts
+with a `WHERE (issued_date, id) < (...)`-style filter. Every page costs
+one indexed range scan of `per_page + 1` rows however deep into the list
+it is, and no query counts the whole list.
+
+The ordering must end in a unique column (usually `id`) and its columns
+must not be NULL.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """
+    One page of results. Iterates like the list it wraps, so templates can
+    keep looping over it; `next_url` / `previous_url` are query strings for
+    the neighbouring pages (None at either end).
+    """
+
+    def __init__(self, object_list, next_url=None, previous_url=None):
+        self.object_list = object_list
+        self.next_url = next_url
+        self.previous_url = previous_url
+
+    @property
+    def has_next(self):
+        return self.next_url is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_url is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _parse_ordering(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _encode(obj, fields):
+    values = [getattr(obj, field) for field, _ in fields]
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def _decode(model, token, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if len(values) != len(fields):
+            return None
+        return [model._meta.get_field(field).to_python(value) for (field, _), value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _seek(fields, values, backwards=False):
+    """Rows strictly after `values` in the ordering (before them if `backwards`)."""
+    condition = Q()
+    equal = Q()
+    for (field, descending), value in zip(fields, values):
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def _page_url(request, param, token):
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[param] = token
+    return f'?{query.urlencode()}'
+
+
+def keyset_page(request, queryset, ordering, per_page=PAGE_SIZE):
+    """
+    The page of `queryset` (sorted by `ordering`, e.g. ('-issued_date', 'id'))
+    selected by the request's `after` / `before` cursor, or the first page.
+    """
+    fields = _parse_ordering(ordering)
+    model = queryset.model
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    cursor = after or before
+    values = _decode(model, cursor, fields) if cursor else None
+
+    if values is not None and not after:
+        # Walk backwards from `before`, then restore the display order.
+        reverse = [f"{'' if descending else '-'}{field}" for field, descending in fields]
+        rows = list(queryset.filter(_seek(fields, values, backwards=True)).order_by(*reverse)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if values is not None:
+            queryset = queryset.filter(_seek(fields, values))
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = values is not None
+
+    return KeysetPage(
+        rows,
+        next_url=_page_url(request, 'after', _encode(rows[-1], fields)) if has_next and rows else None,
+        previous_url=_page_url(request, 'before', _encode(rows[0], fields)) if has_previous and rows else None,
+    )
+
+
+def keyset_iterate(queryset, ordering, fields, batch_size=2000):
+    """
+    Yield `fields` tuples of every row of `queryset` in `ordering`, read in
+    keyset batches of `batch_size`. Unlike QuerySet.iterator(), memory stays
+    at one batch even without server-side cursors.
+    """
+    order_fields = _parse_ordering(ordering)
+    width = len(order_fields)
+    rows = queryset.order_by(*ordering).values_list(*[field for field, _ in order_fields], *fields)
+    batch = list(rows[:batch_size])
+    while batch:
+        for row in batch:
+            yield row[width:]
+        if len(batch) < batch_size:
+            return
+        batch = list(rows.filter(_seek(order_fields, batch[-1][:width]))[:batch_size])
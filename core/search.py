@@ -0,0 +1,53 @@
+"""
+Ranked, school-scoped search shared by the student and book search views.
+
+Matching uses case-insensitive `icontains` on each searched column. On
+Postgres those columns carry pg_trgm GIN indexes on UPPER(col::text)
+(see the Student / Book Meta.indexes), which is exactly the expression
+Django's icontains compiles to, so the leading-wildcard LIKE is answered
+from the index instead of a sequential scan. Results are ranked by the
+best trigram similarity across the columns and cut off at `limit`.
+
+On other databases (local development) the same filter runs without
+ranking.
+"""
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast, Greatest, Upper
+
+SEARCH_LIMIT = 50
+
+
+def trigram_index(field, name):
+    """GIN trigram index matching `<field>__icontains` lookups on Postgres."""
+    return GinIndex(OpClass(Upper(Cast(field, TextField())), name='gin_trgm_ops'), name=name)
+
+
+def search(queryset, query, fields, also=None, limit=SEARCH_LIMIT):
+    """
+    Rows of `queryset` where any of `fields` contains `query`, best
+    matches first, at most `limit` of them; an empty query returns the
+    queryset unchanged. Scope the queryset (e.g. to a school) first.
+
+    `also` is an extra Q OR-ed into the match, e.g.
+    `Q(class_group_id__in=...)` for matches on a related table resolved
+    beforehand (a join inside the OR would defeat the indexes).
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    match = Q()
+    for field in fields:
+        match |= Q(**{f'{field}__icontains': query})
+    if also is not None:
+        match |= also
+    results = queryset.filter(match)
+
+    if connections[results.db].vendor == 'postgresql':
+        similarities = [TrigramSimilarity(field, query) for field in fields]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        results = results.annotate(search_rank=rank).order_by('-search_rank', 'pk')
+    return results[:limit]
@@ -0,0 +1,117 @@
+"""
+Synthetic, reproducible data for benchmarks and tests.
+
+seed_schools() creates schools with classes, students, books, a librarian
+account and several years of loan history using bulk inserts, then
+rebuilds the denormalised tables (SchoolStats / ClassStats and
+DailyCirculation) from the result. The same `seed` gives the same data.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from books.models import Book, Category
+from schools.models import School, UserSchoolProfile
+from schools.stats import rebuild_daily_circulation, rebuild_school_stats
+from schools.tenancy import school_schema
+from students.models import ClassGroup, Student
+from transactions.models import DEFAULT_DAILY_FINE, BorrowTransaction
+
+SEED_BATCH_SIZE = 2000
+LIBRARIAN_PASSWORD = 'librarian'
+
+# Named data sizes used by the benchmark harness (core.benchmark).
+SCALES = {
+    'small': dict(classes=4, students_per_class=10, books=40, years=1, loans_per_student=6),
+    'medium': dict(classes=10, students_per_class=40, books=400, years=2, loans_per_student=10),
+    'large': dict(classes=20, students_per_class=100, books=2000, years=5, loans_per_student=10),
+}
+
+FIRST_NAMES = ('Amina', 'Brian', 'Catherine', 'Daniel', 'Esther', 'Francis', 'Grace', 'Henry', 'Irene', 'Joseph')
+LAST_NAMES = ('Nakato', 'Okello', 'Mugisha', 'Namubiru', 'Ssemakula', 'Atim', 'Kato', 'Achieng', 'Byaruhanga', 'Auma')
+TITLE_WORDS = ('River', 'Silent', 'Garden', 'Journey', 'Mountain', 'Science', 'History', 'Stars', 'Ocean', 'Kingdom')
+
+
+def seed_school(index, classes, students_per_class, books, years, loans_per_student, rng, today=None):
+    """One school named `School <index>` with its data; returns (school, librarian user)."""
+    today = today or timezone.now().date()
+    code = f'S{index:03d}'
+    school = School.objects.create(name=f'School {index}', short_name=code)
+    librarian = get_user_model().objects.create_user(f'librarian-{code.lower()}', password=LIBRARIAN_PASSWORD)
+    UserSchoolProfile.objects.create(user=librarian, school=school, is_librarian=True)
+
+    with school_schema(school):
+        class_groups = ClassGroup.objects.bulk_create([
+            ClassGroup(name=f'{code} Class {n + 1}', short_code=f'C{n + 1}', school=school)
+            for n in range(classes)
+        ])
+        students = Student.objects.bulk_create([
+            Student(
+                student_id=f'{code}-{n:06d}',
+                name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}',
+                class_group=class_groups[n % classes],
+                school=school,
+                email=f'student{n}@{code.lower()}.example',
+            )
+            for n in range(classes * students_per_class)
+        ], batch_size=SEED_BATCH_SIZE)
+        category, _ = Category.objects.get_or_create(name='General')
+        book_rows = Book.objects.bulk_create([
+            Book(
+                title=f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {n}',
+                author=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                isbn=f'978{index:03d}{n:07d}',
+                category=category,
+                school=school,
+                total_copies=rng.randint(2, 8),
+                available=0,
+            )
+            for n in range(books)
+        ], batch_size=SEED_BATCH_SIZE)
+
+        # Loans spread over `years`; the last few weeks' loans are still out.
+        on_loan = {book.id: 0 for book in book_rows}
+        loans = []
+        history_days = 365 * years
+        for student in students:
+            for _ in range(loans_per_student * years):
+                book = rng.choice(book_rows)
+                issued = today - timedelta(days=rng.randint(0, history_days))
+                due = issued + timedelta(days=14)
+                loan = BorrowTransaction(student=student, book=book, school=school, issued_date=issued, due_date=due)
+                if today - issued > timedelta(days=28) or on_loan[book.id] >= book.total_copies:
+                    late_days = max(0, rng.randint(-10, 7))
+                    loan.status = 'RETURNED'
+                    loan.returned_date = min(due + timedelta(days=late_days), today)
+                    loan.fine_amount = Decimal(max(0, (loan.returned_date - due).days) * DEFAULT_DAILY_FINE)
+                else:
+                    loan.status = 'OVERDUE' if due < today else 'ISSUED'
+                    loan.fine_amount = Decimal(max(0, (today - due).days) * DEFAULT_DAILY_FINE)
+                    on_loan[book.id] += 1
+                loans.append(loan)
+                if len(loans) >= SEED_BATCH_SIZE:
+                    BorrowTransaction.objects.bulk_create(loans)
+                    loans = []
+        BorrowTransaction.objects.bulk_create(loans)
+
+        for book in book_rows:
+            book.available = book.total_copies - on_loan[book.id]
+        Book.objects.bulk_update(book_rows, ['available'], batch_size=SEED_BATCH_SIZE)
+
+        rebuild_school_stats(school)
+        rebuild_daily_circulation(school)
+    return school, librarian
+
+
+def seed_schools(schools=1, seed=0, start=1, **sizes):
+    """
+    Create `schools` schools (numbered from `start`) with the given sizes
+    (see SCALES for the keyword arguments). Returns [(school, librarian)].
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        return [seed_school(start + n, rng=rng, **sizes) for n in range(schools)]
@@ -1,17 +1,27 @@
 from django.contrib import admin
-from .models import School, UserSchoolProfile
+from .models import School, SchoolDomain, UserSchoolProfile
+
+
+class SchoolDomainInline(admin.TabularInline):
+    model = SchoolDomain
+    extra = 0
 
 
 @admin.register(School)
 class SchoolAdmin(admin.ModelAdmin):
-    list_display = ('name', 'short_name', 'phone', 'email', 'is_active', 'created_at')
+    list_display = ('name', 'short_name', 'schema_name', 'phone', 'email', 'is_active', 'created_at')
     list_filter = ('is_active',)
     search_fields = ('name', 'short_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('schema_name', 'created_at', 'updated_at')
+    inlines = [SchoolDomainInline]
     fieldsets = (
         (None, {
             'fields': ('name', 'short_name', 'address', 'phone', 'email', 'logo', 'is_active')
         }),
+        ('Tenancy', {
+            'fields': ('schema_name',),
+            'classes': ('collapse',),
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',),
@@ -23,5 +33,6 @@ class SchoolAdmin(admin.ModelAdmin):
 class UserSchoolProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'school', 'is_librarian', 'created_at')
     list_filter = ('is_librarian', 'school')
+    list_select_related = ('user', 'school')
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
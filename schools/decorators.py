@@ -0,0 +1,29 @@
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
+
+
+def librarian_required(view_func=None, message=None):
+    """
+    Allow only signed-in librarians (request.is_librarian, set by
+    SchoolContextMiddleware); everyone else is sent to the student
+    dashboard, with `message` flashed if given.
+
+    Usable bare (@librarian_required) or with arguments
+    (@librarian_required(message="...")).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            if not request.is_librarian:
+                if message:
+                    messages.error(request, message)
+                return redirect('students:student_dashboard')
+            return func(request, *args, **kwargs)
+        return login_required(wrapper)
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
@@ -0,0 +1,86 @@
+"""
+Per-school data generation and the caches keyed on it.
+
+Every write that changes a school's students, classes, books or loans
+bumps the school's generation: single-object saves and deletes through
+schools.signals, bulk paths (issue/return services, imports, the overdue
+sweeper) by calling bump_school_generation() themselves. Anything cached
+under a key that includes the generation (class summaries, dashboard
+template fragments via the {% schoolcache %} tag) is therefore reused
+until that school's data actually changes, and never has to be deleted.
+
+Fragment hits and misses are counted by core.metrics (cache
+"fragment:<name>") so the hit rate can be checked in production, at
+/metrics or with manage.py fragment_cache_stats.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.metrics import CACHE_REQUESTS, record_cache_lookup
+
+# Seconds to keep a rendered fragment; 0 disables fragment caching.
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+
+# Fragment names used in the templates, reported by fragment_cache_stats.
+DASHBOARD_FRAGMENTS = ('librarian-dashboard', 'reports', 'library-stock', 'class-lists')
+
+
+def generation_cache_key(school_id):
+    return f'schools:generation:{school_id}'
+
+
+def school_generation(school_id):
+    """
+    The school's current generation. A missing counter (first use, or
+    evicted) starts from the current time, so it never goes back to a
+    value that older cache entries were stored under.
+    """
+    key = generation_cache_key(school_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_school_generation(*school_ids):
+    """Advance the schools' generations once the current transaction commits."""
+    keys = {generation_cache_key(school_id) for school_id in school_ids if school_id}
+    if not keys:
+        return
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def fragment_cache_key(name, school_id, vary_on=()):
+    """
+    Key for one rendered fragment of one school. Includes today's date,
+    since date-relative figures (due today, overdue) change at midnight.
+    """
+    digest = hashlib.md5(':'.join(str(value) for value in vary_on).encode(), usedforsecurity=False).hexdigest()
+    return f'schools:fragment:{name}:{school_id}:{school_generation(school_id)}:{timezone.localdate()}:{digest}'
+
+
+def record_fragment_hit(name, hit):
+    record_cache_lookup(f'fragment:{name}', hit)
+
+
+def fragment_stats(names):
+    """{name: (hits, misses)} for the given fragment names."""
+    values = CACHE_REQUESTS.values()
+    return {
+        name: (values.get((f'fragment:{name}', 'hit'), 0), values.get((f'fragment:{name}', 'miss'), 0))
+        for name in names
+    }
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schools.models import School
+from schools.stats import rebuild_daily_circulation
+from schools.tenancy import school_schema
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyCirculation rollup from the loans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            help="Only rebuild this school (short code). Defaults to all schools.",
+        )
+        parser.add_argument('--since', help="Only rebuild days from this date on (YYYY-MM-DD). Defaults to all days.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Invalid --since, expected YYYY-MM-DD.")
+
+        schools = School.objects.all()
+        if options['school']:
+            schools = schools.filter(short_name__iexact=options['school'])
+            if not schools.exists():
+                raise CommandError(f"No school with short code '{options['school']}'.")
+
+        for school in schools:
+            with school_schema(school):
+                days = rebuild_daily_circulation(school, since)
+            self.stdout.write(f"{school.short_name}: {days} day(s) of circulation")
+        self.stdout.write(self.style.SUCCESS("Daily circulation rebuilt."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmark import measure_import
+from core.seeding import SCALES, seed_schools
+from students.importing import IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a school in a throwaway test database and import a generated student CSV "
+        "into it: rows per second, queries and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000)
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            [(school, _)] = seed_schools(1, **dict(SCALES['small'], loans_per_student=0))
+            result = measure_import(school, options['rows'], options['batch_size'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{result['rows']} rows, {result['created']} created in {result['seconds']:.2f}s "
+            f"({result['rows_per_s']:.0f} rows/s), {result['queries']} queries, "
+            f"peak {result['peak_kb']:.0f} KB (batch size {options['batch_size']})."
+        )
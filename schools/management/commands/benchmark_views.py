@@ -0,0 +1,57 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core.benchmark import BENCHMARK_CACHES, BENCHMARK_CELERY, run_targets
+from core.seeding import SCALES, seed_schools
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database at each scale and measure every view: "
+        "query count against its budget (core.benchmark.QUERY_BUDGETS), "
+        "p50 / p95 latency and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='small,medium', help=f"Comma-separated, from {', '.join(SCALES)}.")
+        parser.add_argument('--iterations', type=int, default=10, help="Warm requests per view.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        scales = [scale.strip() for scale in options['scales'].split(',') if scale.strip()]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        over_budget = 0
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(CACHES=BENCHMARK_CACHES, MEDIA_ROOT=media_root, **BENCHMARK_CELERY):
+                superuser = get_user_model().objects.create_superuser('benchmark-admin', password='benchmark')
+                for scale in scales:
+                    [(school, librarian)] = seed_schools(1, options['seed'], **SCALES[scale])
+                    self.stdout.write(self.style.MIGRATE_HEADING(
+                        f"{scale}: {school.stats.student_count} students, {school.stats.book_count} books"
+                    ))
+                    self.stdout.write(f"{'view':<48} {'status':>6} {'queries':>7} {'budget':>6} {'warm':>5} "
+                                      f"{'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9}")
+                    for target, result in run_targets(school, librarian, superuser, options['iterations']):
+                        over = result['queries'] > result['budget']
+                        over_budget += over
+                        line = (f"{target.name:<48} {result['status']:>6} {result['queries']:>7} "
+                                f"{result['budget']:>6} {result['warm_queries']:>5} "
+                                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['peak_kb']:>9.0f}")
+                        self.stdout.write(self.style.ERROR(line) if over else line)
+                    call_command('flush', interactive=False, verbosity=0)
+                    superuser = get_user_model().objects.create_superuser('benchmark-admin', password='benchmark')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if over_budget:
+            self.stdout.write(self.style.ERROR(f"{over_budget} view(s) over their query budget."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All views within their query budgets."))
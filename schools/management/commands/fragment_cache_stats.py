@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from schools.generation import DASHBOARD_FRAGMENTS, fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit / miss counts of the cached dashboard fragments."
+
+    def handle(self, *args, **options):
+        for name, (hits, misses) in fragment_stats(DASHBOARD_FRAGMENTS).items():
+            total = hits + misses
+            rate = f"{hits / total:.1%}" if total else "n/a"
+            self.stdout.write(f"{name}: {hits} hits, {misses} misses, hit rate {rate}")
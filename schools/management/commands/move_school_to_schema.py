@@ -0,0 +1,174 @@
+"""
+Move schools out of the shared tables into their own schemas.
+
+Migration path from the shared schema to SCHOOL_TENANCY:
+
+1. Deploy with SCHOOL_TENANCY off and `migrate`; every school gets its
+   schema_name.
+2. In a maintenance window, stop the web and Celery processes and run
+   `SCHOOL_TENANCY=True manage.py move_school_to_schema --all` (or one
+   school at a time, with `--domain` for its host name).
+3. Start everything with SCHOOL_TENANCY=True.
+4. Once the schools are checked, run the command again with `--purge`
+   to delete their rows from the shared tables. Until then the copies
+   in the public schema are untouched, so switching SCHOOL_TENANCY off
+   again goes back to the shared tables (losing writes made since).
+
+Each school's schema is created and migrated by django_tenants, then its
+rows are copied table by table with INSERT ... SELECT in one transaction,
+the id sequences are moved past the copied ids and the row counts are
+compared with the source before committing.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django_tenants.utils import schema_context, schema_exists
+
+from books.models import Book, Category
+from schools.models import ClassStats, DailyCirculation, School, SchoolDomain, SchoolStats
+from schools.tenancy import SCHOOL_TENANCY
+from students.models import ClassGroup, ImportJob, Student
+from transactions.models import ArchivedBorrowTransaction, BorrowTransaction
+
+PUBLIC_SCHEMA = 'public'
+
+# Parents before children, with the column holding the school. Categories
+# are not per school in the shared tables, so every schema gets all of them
+# and they are never purged.
+MOVED_MODELS = [
+    (Category, None),
+    (ClassGroup, 'school_id'),
+    (Student, 'school_id'),
+    (Book, 'school_id'),
+    (ImportJob, 'school_id'),
+    (BorrowTransaction, 'school_id'),
+    (ArchivedBorrowTransaction, 'school_id'),
+    (SchoolStats, 'school_id'),
+    (ClassStats, 'school_id'),
+    (DailyCirculation, 'school_id'),
+]
+
+
+def _table(schema, model):
+    qn = connection.ops.quote_name
+    return f'{qn(schema)}.{qn(model._meta.db_table)}'
+
+
+def _where(column, school):
+    if column is None:
+        return '', []
+    return f'WHERE {connection.ops.quote_name(column)} = %s', [school.pk]
+
+
+def _count(cursor, schema, model, column=None, school=None):
+    where, params = _where(column, school)
+    cursor.execute(f'SELECT COUNT(*) FROM {_table(schema, model)} {where}', params)
+    return cursor.fetchone()[0]
+
+
+def has_moved(school):
+    """Whether `school`'s schema exists and holds students or books."""
+    if not schema_exists(school.schema_name):
+        return False
+    with connection.cursor() as cursor:
+        return bool(_count(cursor, school.schema_name, Student) or _count(cursor, school.schema_name, Book))
+
+
+def copy_school_rows(school):
+    """Copy `school`'s rows from the public schema into its own; returns {model: rows}."""
+    qn = connection.ops.quote_name
+    copied = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for model, column in MOVED_MODELS:
+                columns = ', '.join(qn(field.column) for field in model._meta.concrete_fields)
+                where, params = _where(column, school)
+                cursor.execute(
+                    f'INSERT INTO {_table(school.schema_name, model)} ({columns}) '
+                    f'SELECT {columns} FROM {_table(PUBLIC_SCHEMA, model)} {where}',
+                    params,
+                )
+                expected = _count(cursor, PUBLIC_SCHEMA, model, column, school)
+                found = _count(cursor, school.schema_name, model)
+                if cursor.rowcount != expected or found != expected:
+                    raise CommandError(
+                        f"{school.short_name}: {model._meta.db_table} has {found} row(s) in "
+                        f"{school.schema_name}, expected {expected}; nothing was moved."
+                    )
+                copied[model] = expected
+
+        # The copied rows keep their ids, so start each sequence after them.
+        # Unqualified table names resolve to the school's schema first.
+        with schema_context(school.schema_name), connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model for model, _ in MOVED_MODELS]):
+                cursor.execute(sql)
+    return copied
+
+
+def purge_school_rows(school):
+    """Delete `school`'s rows from the shared tables; returns the number of rows deleted."""
+    deleted = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, column in reversed(MOVED_MODELS):
+            if column is None:
+                continue
+            where, params = _where(column, school)
+            cursor.execute(f'DELETE FROM {_table(PUBLIC_SCHEMA, model)} {where}', params)
+            deleted += cursor.rowcount
+    return deleted
+
+
+class Command(BaseCommand):
+    help = "Copy schools' data from the shared tables into their own schemas (run with SCHOOL_TENANCY=True)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('schools', nargs='*', metavar='short_code', help="Schools to move (short codes).")
+        parser.add_argument('--all', action='store_true', help="Move every school.")
+        parser.add_argument('--domain', help="Host name to route to the school (only with a single school).")
+        parser.add_argument(
+            '--purge', action='store_true',
+            help="Delete already moved schools' rows from the shared tables instead of moving them.",
+        )
+
+    def handle(self, *args, **options):
+        if not SCHOOL_TENANCY:
+            raise CommandError("Set SCHOOL_TENANCY=True to create the school schemas.")
+        if options['all'] == bool(options['schools']):
+            raise CommandError("Give school short codes or --all.")
+        if options['domain'] and len(options['schools']) != 1:
+            raise CommandError("--domain needs exactly one school.")
+
+        schools = School.objects.order_by('pk')
+        if options['schools']:
+            codes = {code.upper() for code in options['schools']}
+            schools = [school for school in schools if school.short_name.upper() in codes]
+            missing = codes - {school.short_name.upper() for school in schools}
+            if missing:
+                raise CommandError(f"No school with short code {', '.join(sorted(missing))}.")
+
+        for school in schools:
+            connection.set_schema_to_public()
+            if options['purge']:
+                self.purge(school)
+            else:
+                self.move(school, options['domain'], options['verbosity'])
+        connection.set_schema_to_public()
+
+    def move(self, school, domain, verbosity):
+        if has_moved(school):
+            self.stdout.write(self.style.WARNING(f"{school.short_name}: {school.schema_name} already has data - skipped."))
+            return
+        school.create_schema(check_if_exists=True, verbosity=verbosity)
+
+        copied = copy_school_rows(school)
+        connection.set_schema_to_public()
+        if domain:
+            SchoolDomain.objects.update_or_create(domain=domain.lower(), defaults={'tenant': school, 'is_primary': True})
+        summary = ', '.join(f"{rows} {model._meta.verbose_name_plural}" for model, rows in copied.items())
+        self.stdout.write(self.style.SUCCESS(f"{school.short_name}: moved to {school.schema_name} ({summary})."))
+
+    def purge(self, school):
+        if not has_moved(school):
+            raise CommandError(f"{school.short_name} has not been moved to {school.schema_name}; not purging.")
+        deleted = purge_school_rows(school)
+        self.stdout.write(self.style.SUCCESS(f"{school.short_name}: {deleted} row(s) deleted from the shared tables."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School
+from schools.stats import rebuild_school_stats
+from schools.tenancy import school_schema
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SchoolStats / ClassStats summary tables from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            help="Only rebuild this school (short code). Defaults to all schools.",
+        )
+
+    def handle(self, *args, **options):
+        schools = School.objects.all()
+        if options['school']:
+            schools = schools.filter(short_name__iexact=options['school'])
+            if not schools.exists():
+                raise CommandError(f"No school with short code '{options['school']}'.")
+
+        for school in schools:
+            with school_schema(school):
+                stats = rebuild_school_stats(school)
+            self.stdout.write(
+                f"{school.short_name}: {stats.student_count} students, {stats.class_count} classes, "
+                f"{stats.book_count} books, {stats.active_loans} active loans"
+            )
+        self.stdout.write(self.style.SUCCESS("School statistics rebuilt."))
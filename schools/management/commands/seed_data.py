@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import SCALES, seed_schools
+from schools.models import School
+
+
+class Command(BaseCommand):
+    help = "Create synthetic schools with classes, students, books and loan history (for development and benchmarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help="Preset data size per school.")
+        parser.add_argument('--schools', type=int, default=1)
+        parser.add_argument('--classes', type=int, help="Override the preset.")
+        parser.add_argument('--students-per-class', type=int, help="Override the preset.")
+        parser.add_argument('--books', type=int, help="Override the preset.")
+        parser.add_argument('--years', type=int, help="Years of loan history; overrides the preset.")
+        parser.add_argument('--loans-per-student', type=int, help="Loans per student per year; overrides the preset.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for key in sizes:
+            if options[key] is not None:
+                sizes[key] = options[key]
+
+        start = (School.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        if School.objects.filter(short_name=f'S{start:03d}').exists():
+            raise CommandError(f"School S{start:03d} already exists.")
+
+        for school, librarian in seed_schools(options['schools'], options['seed'], start, **sizes):
+            stats = school.stats
+            self.stdout.write(
+                f"{school.short_name}: {stats.student_count} students, {stats.book_count} books, "
+                f"{stats.active_loans + stats.returned_loans} loans; librarian '{librarian.username}'"
+            )
+        self.stdout.write(self.style.SUCCESS("Seed data created."))
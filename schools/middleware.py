@@ -0,0 +1,67 @@
+"""
+Per-request school context.
+
+SchoolContextMiddleware resolves the signed-in user's UserSchoolProfile
+and School once per request and exposes them as `request.school` and
+`request.is_librarian`. The lookup is one select_related query, cached
+per user until the profile or the school changes (see schools.signals),
+so a warm request spends no queries on it.
+
+With SCHOOL_TENANCY the request's schema comes from its host
+(request.tenant); a user only gets their school context on their own
+school's host, never on another school's or on the main domain.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.metrics import record_cache_lookup
+
+from .models import UserSchoolProfile
+from .tenancy import SCHOOL_TENANCY
+
+# Seconds to keep a user's school context; 0 disables the cache.
+SCHOOL_CONTEXT_CACHE_TIMEOUT = getattr(settings, 'SCHOOL_CONTEXT_CACHE_TIMEOUT', 600)
+
+
+def school_context_cache_key(user_id):
+    return f'schools:context:{user_id}'
+
+
+def invalidate_school_context(*user_ids):
+    """Drop cached school contexts once the current transaction commits."""
+    keys = [school_context_cache_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_school_context(user):
+    """(school, is_librarian) for `user`; (None, False) without a profile."""
+    key = school_context_cache_key(user.pk)
+    if SCHOOL_CONTEXT_CACHE_TIMEOUT:
+        context = cache.get(key)
+        record_cache_lookup('school-context', context is not None)
+        if context is not None:
+            return context
+
+    profile = UserSchoolProfile.objects.select_related('school').filter(user_id=user.pk).first()
+    context = (profile.school, profile.is_librarian) if profile else (None, False)
+    if SCHOOL_CONTEXT_CACHE_TIMEOUT:
+        cache.set(key, context, SCHOOL_CONTEXT_CACHE_TIMEOUT)
+    return context
+
+
+class SchoolContextMiddleware:
+    """Must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.school, request.is_librarian = None, False
+        if request.user.is_authenticated:
+            request.school, request.is_librarian = get_school_context(request.user)
+            tenant = getattr(request, 'tenant', None)
+            if SCHOOL_TENANCY and request.school is not None and getattr(tenant, 'pk', None) != request.school.pk:
+                request.school, request.is_librarian = None, False
+        return self.get_response(request)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.10 on 2026-10-17 06:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0002_userschoolprofile'),
+        ('students', '0004_alter_student_gender_alter_student_student_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolStats',
+            fields=[
+                ('school', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='schools.school', verbose_name='School')),
+                ('student_count', models.IntegerField(default=0)),
+                ('class_count', models.IntegerField(default=0)),
+                ('book_count', models.IntegerField(default=0)),
+                ('total_copies', models.IntegerField(default=0)),
+                ('available_copies', models.IntegerField(default=0)),
+                ('active_loans', models.IntegerField(default=0, help_text='Loans currently ISSUED or OVERDUE')),
+                ('overdue_loans', models.IntegerField(default=0)),
+                ('returned_loans', models.IntegerField(default=0)),
+                ('on_time_returns', models.IntegerField(default=0)),
+                ('issued_today', models.IntegerField(default=0, help_text='Loans issued on last_issued_on')),
+                ('last_issued_on', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'School Statistics',
+                'verbose_name_plural': 'School Statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassStats',
+            fields=[
+                ('class_group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='students.classgroup', verbose_name='Class')),
+                ('student_count', models.IntegerField(default=0)),
+                ('active_loans', models.IntegerField(default=0)),
+                ('overdue_loans', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_stats', to='schools.school', verbose_name='School')),
+            ],
+            options={
+                'verbose_name': 'Class Statistics',
+                'verbose_name_plural': 'Class Statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0003_schoolstats_classstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCirculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('issued', models.IntegerField(default=0)),
+                ('returned', models.IntegerField(default=0)),
+                ('overdue_new', models.IntegerField(default=0, help_text='Loans that became overdue on this day')),
+                ('fines_accrued', models.DecimalField(decimal_places=2, default=0, help_text='Fines charged on loans returned this day', max_digits=12)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_circulation', to='schools.school', verbose_name='School')),
+            ],
+            options={
+                'verbose_name': 'Daily Circulation',
+                'verbose_name_plural': 'Daily Circulation',
+                'constraints': [models.UniqueConstraint(fields=('school', 'date'), name='daily_circulation_school_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+import django.db.models.deletion
+import django_tenants.postgresql_backend.base
+from django.db import migrations, models
+
+from schools.tenancy import school_schema_name
+
+
+def set_schema_names(apps, schema_editor):
+    School = apps.get_model('schools', 'School')
+    taken = set()
+    for school in School.objects.order_by('pk'):
+        name = school_schema_name(school.short_name, taken)
+        taken.add(name)
+        School.objects.filter(pk=school.pk).update(schema_name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0004_dailycirculation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='schema_name',
+            field=models.CharField(max_length=63, null=True),
+        ),
+        migrations.RunPython(set_schema_names, migrations.RunPython.noop, hints={'model_name': 'school'}),
+        migrations.AlterField(
+            model_name='school',
+            name='schema_name',
+            field=models.CharField(
+                db_index=True,
+                max_length=63,
+                unique=True,
+                validators=[django_tenants.postgresql_backend.base._check_schema_name],
+            ),
+        ),
+        migrations.CreateModel(
+            name='SchoolDomain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(db_index=True, max_length=253, unique=True)),
+                ('is_primary', models.BooleanField(db_index=True, default=True)),
+                ('tenant', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='domains',
+                    to='schools.school',
+                )),
+            ],
+            options={
+                'verbose_name': 'School Domain',
+                'verbose_name_plural': 'School Domains',
+            },
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
 from django.conf import settings
+from django_tenants.models import DomainMixin, TenantMixin
 
+from .tenancy import SCHOOL_TENANCY, school_schema_name
 
-class School(models.Model):
+
+class School(TenantMixin):
     name = models.CharField(max_length=200, unique=True, verbose_name="School Name")
     short_name = models.CharField(max_length=50, unique=True, verbose_name="Short Code")
     address = models.TextField(blank=True, verbose_name="Physical Address")
@@ -13,6 +16,10 @@ class School(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # The schema is created (and migrated) on save only with tenancy on;
+    # schools created before are moved by move_school_to_schema.
+    auto_create_schema = SCHOOL_TENANCY
+
     class Meta:
         ordering = ['name']
         verbose_name = "School"
@@ -21,6 +28,20 @@ class School(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.schema_name:
+            taken = set(School.objects.exclude(pk=self.pk).values_list('schema_name', flat=True))
+            self.schema_name = school_schema_name(self.short_name, taken)
+        super().save(*args, **kwargs)
+
+
+class SchoolDomain(DomainMixin):
+    """Host name whose requests use a school's schema (SCHOOL_TENANCY)."""
+
+    class Meta:
+        verbose_name = "School Domain"
+        verbose_name_plural = "School Domains"
+
 
 class UserSchoolProfile(models.Model):
     user = models.OneToOneField(
@@ -47,4 +68,105 @@ class UserSchoolProfile(models.Model):
 
     def __str__(self):
         school_name = self.school.name if self.school else "No school"
-        return f"{self.user.username} - {school_name}"
\ No newline at end of file
+        return f"{self.user.username} - {school_name}"
+
+
+class SchoolStats(models.Model):
+    """
+    Denormalised headline numbers for one school, kept up to date
+    incrementally by schools.signals / schools.stats so dashboards can read
+    them without scanning students, books and loans.
+    """
+    school = models.OneToOneField(
+        School,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="School"
+    )
+    student_count = models.IntegerField(default=0)
+    class_count = models.IntegerField(default=0)
+    book_count = models.IntegerField(default=0)
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0, help_text="Loans currently ISSUED or OVERDUE")
+    overdue_loans = models.IntegerField(default=0)
+    returned_loans = models.IntegerField(default=0)
+    on_time_returns = models.IntegerField(default=0)
+    issued_today = models.IntegerField(default=0, help_text="Loans issued on last_issued_on")
+    last_issued_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "School Statistics"
+        verbose_name_plural = "School Statistics"
+
+    def __str__(self):
+        return f"Stats for {self.school}"
+
+    def issued_on(self, date):
+        return self.issued_today if self.last_issued_on == date else 0
+
+    @property
+    def on_time_percentage(self):
+        if not self.returned_loans:
+            return 0
+        return round(self.on_time_returns / self.returned_loans * 100, 1)
+
+
+class ClassStats(models.Model):
+    """Per-class counterpart of SchoolStats."""
+    class_group = models.OneToOneField(
+        'students.ClassGroup',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Class"
+    )
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        related_name='class_stats',
+        verbose_name="School"
+    )
+    student_count = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0)
+    overdue_loans = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Class Statistics"
+        verbose_name_plural = "Class Statistics"
+
+    def __str__(self):
+        return f"Stats for {self.class_group}"
+
+
+class DailyCirculation(models.Model):
+    """
+    One school's circulation for one day, kept up to date incrementally by
+    schools.stats.record_circulation() so time-series charts read at most
+    one row per day instead of grouping over the loans. Rebuilt from the
+    loans by `manage.py backfill_daily_circulation`.
+    """
+    school = models.ForeignKey(
+        School,
+        on_delete=models.CASCADE,
+        related_name='daily_circulation',
+        verbose_name="School"
+    )
+    date = models.DateField()
+    issued = models.IntegerField(default=0)
+    returned = models.IntegerField(default=0)
+    overdue_new = models.IntegerField(default=0, help_text="Loans that became overdue on this day")
+    fines_accrued = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Fines charged on loans returned this day")
+
+    class Meta:
+        verbose_name = "Daily Circulation"
+        verbose_name_plural = "Daily Circulation"
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'date'], name='daily_circulation_school_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.school} {self.date}"
@@ -0,0 +1,18 @@
+from django.db import connections
+from django_tenants.routers import TenantSyncRouter
+from django_tenants.utils import get_public_schema_name
+
+# The schools app is in both SHARED_APPS and TENANT_APPS: School,
+# SchoolDomain and UserSchoolProfile are shared, these models are per school.
+TENANT_SCHOOL_MODELS = {'schoolstats', 'classstats', 'dailycirculation'}
+
+
+class SchoolTenantRouter(TenantSyncRouter):
+    """TenantSyncRouter that splits the schools app between the public and the school schemas by model."""
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'schools' and model_name is not None:
+            in_school_schema = connections[db].schema_name != get_public_schema_name()
+            if (model_name in TENANT_SCHOOL_MODELS) != in_school_schema:
+                return False
+        return super().allow_migrate(db, app_label, model_name, **hints)
@@ -0,0 +1,192 @@
+from django.db.models import F
+from django.db.models.expressions import Combinable
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from books.models import Book
+from students.models import ClassGroup, Student
+from transactions.models import BorrowTransaction
+from .generation import bump_school_generation
+from .middleware import invalidate_school_context
+from .models import ClassStats, School, SchoolStats, UserSchoolProfile
+from .stats import ACTIVE_STATUSES, apply_deltas, loan_deltas, merge_deltas, record_circulation, record_issue
+
+
+TRACKED_FIELDS = {
+    Student: ('school_id', 'class_group_id'),
+    Book: ('total_copies', 'available'),
+    BorrowTransaction: ('status', 'returned_date', 'due_date'),
+}
+
+
+def _remember_old_values(sender, instance, **kwargs):
+    # Existing rows: fetch the stored values so post_save can diff against
+    # them. Bulk paths (bulk_create / queryset.update) bypass signals and
+    # update the stats themselves.
+    instance._stats_old = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._stats_old = sender._base_manager.filter(pk=instance.pk).values(*TRACKED_FIELDS[sender]).first()
+
+
+for _model in TRACKED_FIELDS:
+    pre_save.connect(_remember_old_values, sender=_model, dispatch_uid=f'stats_old_{_model.__name__}')
+pre_delete.connect(_remember_old_values, sender=Book, dispatch_uid='stats_old_Book_delete')
+
+
+def _old(instance, field):
+    old = getattr(instance, '_stats_old', None) or {}
+    return old.get(field, getattr(instance, field))
+
+
+def _on_time(loan):
+    return bool(loan.returned_date and loan.due_date and loan.returned_date <= loan.due_date)
+
+
+# ────────────────────────────────────────────────
+#   Students & classes
+# ────────────────────────────────────────────────
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_deltas(instance.school_id, instance.class_group_id, student_count=1)
+        bump_school_generation(instance.school_id)
+    else:
+        old_school = _old(instance, 'school_id')
+        old_class = _old(instance, 'class_group_id')
+        if (old_school, old_class) != (instance.school_id, instance.class_group_id):
+            # A move carries the student's open loans to the new class as well.
+            loans = instance.borrow_transactions.filter(status__in=ACTIVE_STATUSES)
+            active = loans.count()
+            overdue = loans.filter(status='OVERDUE').count()
+            moved = {'student_count': 1, 'active_loans': active, 'overdue_loans': overdue}
+            apply_deltas(None, old_class, **{f: -n for f, n in moved.items()})
+            apply_deltas(None, instance.class_group_id, **moved)
+            if old_school != instance.school_id:
+                # The school rows count loans by the loan's (book's) school,
+                # so only the student moves between them.
+                apply_deltas(old_school, student_count=-1)
+                apply_deltas(instance.school_id, student_count=1)
+            bump_school_generation(old_school, instance.school_id)
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    apply_deltas(instance.school_id, instance.class_group_id, student_count=-1)
+    bump_school_generation(instance.school_id)
+
+
+@receiver(post_save, sender=ClassGroup)
+def class_group_saved(sender, instance, created, **kwargs):
+    if created:
+        ClassStats.objects.get_or_create(class_group=instance, defaults={'school_id': instance.school_id})
+        apply_deltas(instance.school_id, class_count=1)
+    bump_school_generation(instance.school_id)
+
+
+@receiver(post_delete, sender=ClassGroup)
+def class_group_deleted(sender, instance, **kwargs):
+    apply_deltas(instance.school_id, class_count=-1)
+    bump_school_generation(instance.school_id)
+
+
+# ────────────────────────────────────────────────
+#   Books
+# ────────────────────────────────────────────────
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_deltas(
+            instance.school_id,
+            book_count=1,
+            total_copies=instance.total_copies,
+            available_copies=instance.available,
+        )
+    else:
+        # F() updates (e.g. available=F('available') + 1) are accounted for
+        # by the caller, which knows the delta.
+        deltas = {}
+        for field, stat in (('total_copies', 'total_copies'), ('available', 'available_copies')):
+            value = getattr(instance, field)
+            old = _old(instance, field)
+            if not isinstance(value, Combinable):
+                deltas[stat] = value - old
+        apply_deltas(instance.school_id, **deltas)
+    bump_school_generation(instance.school_id)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    apply_deltas(
+        instance.school_id,
+        book_count=-1,
+        total_copies=-_old(instance, 'total_copies'),
+        available_copies=-_old(instance, 'available'),
+    )
+    bump_school_generation(instance.school_id)
+
+
+# ────────────────────────────────────────────────
+#   Loans
+# ────────────────────────────────────────────────
+
+def _loan_scope(loan):
+    return loan.school_id, loan.student.class_group_id
+
+
+@receiver(post_save, sender=BorrowTransaction)
+def loan_saved(sender, instance, created, **kwargs):
+    school_id, class_group_id = _loan_scope(instance)
+    # Copies reserved / released by BorrowTransaction.save (books.stock).
+    apply_deltas(school_id, available_copies=getattr(instance, '_stock_delta', 0))
+    old_status = None if created else _old(instance, 'status')
+    if created:
+        if instance.status == 'ISSUED':
+            record_issue(school_id, class_group_id, 1, instance.issued_date)
+        else:
+            apply_deltas(school_id, class_group_id, **loan_deltas(instance.status, _on_time(instance)))
+            record_circulation(school_id, instance.issued_date, issued=1)
+    else:
+        old_returned = _old(instance, 'returned_date')
+        old_due = _old(instance, 'due_date')
+        old_on_time = bool(old_returned and old_due and old_returned <= old_due)
+        new_on_time = _on_time(instance)
+        if (old_status, old_on_time) != (instance.status, new_on_time):
+            apply_deltas(school_id, class_group_id, **merge_deltas(
+                loan_deltas(old_status, old_on_time, sign=-1),
+                loan_deltas(instance.status, new_on_time),
+            ))
+        if old_status == 'ISSUED' and instance.status == 'OVERDUE' and instance.due_date:
+            record_circulation(school_id, instance.due_date + timezone.timedelta(days=1), overdue_new=1)
+    if old_status != 'RETURNED' and instance.status == 'RETURNED' and instance.returned_date:
+        record_circulation(school_id, instance.returned_date, returned=1, fines_accrued=instance.fine_amount)
+    bump_school_generation(school_id)
+
+
+@receiver(post_delete, sender=BorrowTransaction)
+def loan_deleted(sender, instance, **kwargs):
+    school_id, class_group_id = _loan_scope(instance)
+    apply_deltas(school_id, class_group_id, **loan_deltas(instance.status, _on_time(instance), sign=-1))
+    bump_school_generation(school_id)
+    if instance.issued_date == timezone.now().date():
+        SchoolStats.objects.filter(school_id=school_id, last_issued_on=instance.issued_date).update(
+            issued_today=F('issued_today') - 1
+        )
+
+
+# ────────────────────────────────────────────────
+#   Cached request context (schools.middleware)
+# ────────────────────────────────────────────────
+
+@receiver(post_save, sender=UserSchoolProfile)
+@receiver(post_delete, sender=UserSchoolProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_school_context(instance.user_id)
+
+
+@receiver(post_save, sender=School)
+@receiver(pre_delete, sender=School)  # before the profiles' school is set to NULL
+def school_changed(sender, instance, **kwargs):
+    invalidate_school_context(*instance.user_profiles.values_list('user_id', flat=True))
@@ -0,0 +1,234 @@
+"""
+Incremental maintenance of SchoolStats / ClassStats.
+
+Writers call apply_deltas() (or record_issue() for new loans) after they
+change students, classes, books or loans, and record_circulation() for the
+DailyCirculation rollup; single-object saves and deletes are covered by
+the handlers in schools.signals. Rows are created lazily by
+rebuild_school_stats() the first time a school's stats are read, so a
+missing row is never an error.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from books.models import Book
+from core.metrics import FINES_ACCRUED, LOANS_ISSUED, LOANS_OVERDUE, LOANS_RETURNED
+from students.models import ClassGroup, Student
+from transactions.models import ACTIVE_STATUSES, LoanHistory
+from .models import ClassStats, DailyCirculation, SchoolStats
+
+CLASS_FIELDS = ('student_count', 'active_loans', 'overdue_loans')
+
+
+def loan_deltas(status, on_time=False, sign=1):
+    """Counter changes for one loan entering (sign=1) or leaving (sign=-1) `status`."""
+    deltas = {}
+    if status in ACTIVE_STATUSES:
+        deltas['active_loans'] = sign
+    if status == 'OVERDUE':
+        deltas['overdue_loans'] = sign
+    if status == 'RETURNED':
+        deltas['returned_loans'] = sign
+        if on_time:
+            deltas['on_time_returns'] = sign
+    return deltas
+
+
+def merge_deltas(*delta_dicts):
+    merged = {}
+    for deltas in delta_dicts:
+        for field, value in deltas.items():
+            merged[field] = merged.get(field, 0) + value
+    return {field: value for field, value in merged.items() if value}
+
+
+def apply_deltas(school_id, class_group_id=None, **deltas):
+    """Add `deltas` to the school's summary row and, for class-level fields, to the class row."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    if school_id:
+        SchoolStats.objects.filter(school_id=school_id).update(
+            **{field: F(field) + value for field, value in deltas.items()}
+        )
+    class_deltas = {field: F(field) + value for field, value in deltas.items() if field in CLASS_FIELDS}
+    if class_group_id and class_deltas:
+        ClassStats.objects.filter(class_group_id=class_group_id).update(**class_deltas)
+
+
+def apply_scope_deltas(per_scope):
+    """
+    apply_deltas() for many {(school_id, class_group_id): deltas} at once,
+    with one UPDATE per school and one UPDATE for all the classes.
+    """
+    per_school = {}
+    per_class = {}
+    for (school_id, class_group_id), deltas in per_scope.items():
+        per_school[school_id] = merge_deltas(per_school.get(school_id, {}), deltas)
+        class_deltas = {field: value for field, value in deltas.items() if field in CLASS_FIELDS}
+        if class_group_id and class_deltas:
+            per_class[class_group_id] = merge_deltas(per_class.get(class_group_id, {}), class_deltas)
+
+    for school_id, deltas in per_school.items():
+        apply_deltas(school_id, **deltas)
+    fields = {field for deltas in per_class.values() for field in deltas}
+    if fields:
+        ClassStats.objects.filter(class_group_id__in=per_class).update(**{
+            field: F(field) + Case(
+                *[When(class_group_id=class_group_id, then=Value(deltas[field]))
+                  for class_group_id, deltas in per_class.items() if field in deltas],
+                default=Value(0),
+            )
+            for field in fields
+        })
+
+
+def record_issue(school_id, class_group_id, count, issued_date=None):
+    """Account for `count` new ISSUED loans, including the issued-today counter."""
+    if not count:
+        return
+    issued_date = issued_date or timezone.now().date()
+    SchoolStats.objects.filter(school_id=school_id).update(
+        active_loans=F('active_loans') + count,
+        issued_today=Case(
+            When(last_issued_on=issued_date, then=F('issued_today') + count),
+            default=Value(count),
+        ),
+        last_issued_on=issued_date,
+    )
+    if class_group_id:
+        ClassStats.objects.filter(class_group_id=class_group_id).update(
+            active_loans=F('active_loans') + count,
+        )
+    record_circulation(school_id, issued_date, issued=count)
+
+
+def record_circulation(school_id, date, **deltas):
+    """Add `deltas` (issued, returned, overdue_new, fines_accrued) to the school's DailyCirculation row for `date`."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not school_id or not deltas:
+        return
+    LOANS_ISSUED.inc(deltas.get('issued', 0))
+    LOANS_RETURNED.inc(deltas.get('returned', 0))
+    LOANS_OVERDUE.inc(deltas.get('overdue_new', 0))
+    FINES_ACCRUED.inc(deltas.get('fines_accrued', 0))
+    rows = DailyCirculation.objects.filter(school_id=school_id, date=date)
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyCirculation.objects.create(school_id=school_id, date=date, **deltas)
+    except IntegrityError:
+        # Created concurrently by another writer.
+        rows.update(**updates)
+
+
+def get_school_stats(school):
+    if school is None:
+        return SchoolStats()
+    try:
+        return SchoolStats.objects.get(school=school)
+    except SchoolStats.DoesNotExist:
+        return rebuild_school_stats(school)
+
+
+def rebuild_school_stats(school):
+    """Recompute the summary row and all class rows for `school` from scratch."""
+    today = timezone.now().date()
+    active = Q(status__in=ACTIVE_STATUSES)
+    overdue = Q(status='OVERDUE')
+    returned = Q(status='RETURNED')
+
+    books = Book.objects.filter(school=school).aggregate(
+        book_count=Count('id'),
+        total_copies=Sum('total_copies'),
+        available_copies=Sum('available'),
+    )
+    # Both tiers: archived loans still count as returned (transactions.services.archive_closed_loans).
+    loans = LoanHistory.objects.filter(school=school).aggregate(
+        active_loans=Count('id', filter=active),
+        overdue_loans=Count('id', filter=overdue),
+        returned_loans=Count('id', filter=returned),
+        on_time_returns=Count('id', filter=returned & Q(returned_date__lte=F('due_date'))),
+        issued_today=Count('id', filter=Q(issued_date=today)),
+    )
+    class_rows = list(ClassGroup.objects.filter(school=school).annotate(
+        n_students=Count('students', distinct=True),
+        n_active=Count('students__borrow_transactions', filter=Q(students__borrow_transactions__status__in=ACTIVE_STATUSES)),
+        n_overdue=Count('students__borrow_transactions', filter=Q(students__borrow_transactions__status='OVERDUE')),
+    ).values_list('id', 'n_students', 'n_active', 'n_overdue'))
+
+    with transaction.atomic():
+        stats, _ = SchoolStats.objects.update_or_create(
+            school=school,
+            defaults={
+                'student_count': Student.objects.filter(school=school).count(),
+                'class_count': len(class_rows),
+                'book_count': books['book_count'],
+                'total_copies': books['total_copies'] or 0,
+                'available_copies': books['available_copies'] or 0,
+                'last_issued_on': today,
+                **loans,
+            },
+        )
+        ClassStats.objects.filter(school=school).delete()
+        ClassStats.objects.bulk_create([
+            ClassStats(
+                class_group_id=class_id,
+                school=school,
+                student_count=n_students,
+                active_loans=n_active,
+                overdue_loans=n_overdue,
+            )
+            for class_id, n_students, n_active, n_overdue in class_rows
+        ])
+    return stats
+
+
+def rebuild_daily_circulation(school, since=None):
+    """
+    Recompute `school`'s DailyCirculation rows (from `since` on, or all of
+    them) from the loans. A loan counts as newly overdue on the day after
+    its due date if it is OVERDUE now or was returned late. Returns the
+    number of rows written.
+    """
+    loans = LoanHistory.objects.filter(school=school)
+    days = {}
+
+    def add(date, **values):
+        if since and date < since:
+            return
+        row = days.setdefault(date, {'issued': 0, 'returned': 0, 'overdue_new': 0, 'fines_accrued': 0})
+        for field, value in values.items():
+            row[field] += value or 0
+
+    issued = loans.filter(issued_date__gte=since) if since else loans
+    for row in issued.values('issued_date').annotate(n=Count('id')).order_by():
+        add(row['issued_date'], issued=row['n'])
+
+    returned = loans.filter(status='RETURNED', returned_date__isnull=False)
+    if since:
+        returned = returned.filter(returned_date__gte=since)
+    for row in returned.values('returned_date').annotate(n=Count('id'), fines=Sum('fine_amount')).order_by():
+        add(row['returned_date'], returned=row['n'], fines_accrued=row['fines'])
+
+    overdue = loans.filter(Q(status='OVERDUE') | Q(status='RETURNED', returned_date__gt=F('due_date')))
+    if since:
+        overdue = overdue.filter(due_date__gte=since - timedelta(days=1))
+    for row in overdue.values('due_date').annotate(n=Count('id')).order_by():
+        add(row['due_date'] + timedelta(days=1), overdue_new=row['n'])
+
+    with transaction.atomic():
+        existing = DailyCirculation.objects.filter(school=school)
+        if since:
+            existing = existing.filter(date__gte=since)
+        existing.delete()
+        DailyCirculation.objects.bulk_create(
+            [DailyCirculation(school=school, date=date, **values) for date, values in days.items()],
+            batch_size=1000,
+        )
+    return len(days)
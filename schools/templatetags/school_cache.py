@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache import cache
+
+from schools.generation import FRAGMENT_CACHE_TIMEOUT, fragment_cache_key, record_fragment_hit
+
+register = template.Library()
+
+
+class SchoolCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        request = context.get('request')
+        school = getattr(request, 'school', None)
+        if school is None or not FRAGMENT_CACHE_TIMEOUT:
+            return self.nodelist.render(context)
+
+        name = self.name.resolve(context)
+        key = fragment_cache_key(name, school.pk, [var.resolve(context) for var in self.vary_on])
+        content = cache.get(key)
+        record_fragment_hit(name, content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, FRAGMENT_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag('schoolcache')
+def do_school_cache(parser, token):
+    """
+    Cache the enclosed fragment for request.school until the school's data
+    generation changes (see schools.generation)::
+
+        {% load school_cache %}
+        {% schoolcache "reports" [vary_on ...] %} ... {% endschoolcache %}
+
+    Values computed lazily in the view (querysets, callables) are only
+    evaluated on a miss. Renders uncached when there is no school.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name.")
+    nodelist = parser.parse(('endschoolcache',))
+    parser.delete_first_token()
+    return SchoolCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,63 @@
+"""
+Schema-per-school tenancy (django_tenants), switched on by SCHOOL_TENANCY.
+
+Off (the default), every school's rows live in the shared tables of the
+public schema and are told apart by their `school` foreign keys. On,
+School is the tenant model: each school has its own Postgres schema
+holding the tables of TENANT_APPS (students, books, loans, per-school
+stats), TenantMainMiddleware picks the schema from the request host
+(SchoolDomain), and the public schema keeps the shared tables (users,
+sessions, schools, domains, profiles). Existing schools are moved with
+`manage.py move_school_to_schema`.
+
+Code that runs outside a request (Celery tasks, commands) enters a
+school's schema with school_schema(); in shared mode it is a no-op.
+"""
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+
+SCHOOL_TENANCY = getattr(settings, 'SCHOOL_TENANCY', False)
+
+
+def school_schema_name(short_name, taken=()):
+    """
+    Postgres schema name for a school with this short code, e.g. 'S001' ->
+    'school_s001'. Codes that normalise to a name in `taken` get a number
+    appended ('school_s001_2').
+    """
+    base = 'school_' + re.sub(r'[^a-z0-9]+', '_', short_name.lower()).strip('_')
+    name, n = base[:63], 1
+    while name in taken:
+        n += 1
+        suffix = f'_{n}'
+        name = base[:63 - len(suffix)] + suffix
+    return name
+
+
+@contextmanager
+def school_schema(school):
+    """Run the block in `school`'s schema (a School or its id); no-op without tenancy or school."""
+    if not SCHOOL_TENANCY or school is None:
+        yield
+        return
+    from django_tenants.utils import tenant_context
+
+    from .models import School
+    if not isinstance(school, School):
+        school = School.objects.get(pk=school)
+    with tenant_context(school):
+        yield
+
+
+def tenant_schools():
+    """
+    Schools to visit one schema at a time in jobs that cover every school
+    (overdue sweep, loan archive): all of them with tenancy, inactive ones
+    included, or [None] (the shared tables) without.
+    """
+    if not SCHOOL_TENANCY:
+        return [None]
+    from .models import School
+    return list(School.objects.order_by('pk'))
@@ -1,3 +1,59 @@
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmark import QueryBudgetTestMixin
+from core.seeding import SCALES, seed_schools
+from schools.models import ClassStats, School, SchoolStats
+from schools.stats import rebuild_school_stats
+from students.models import ClassGroup, Student
+from transactions.models import ACTIVE_STATUSES
+
+
+class AdminQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Admin changelists and custom admin views of all apps."""
+    target_prefixes = ('admin:',)
+
+
+class SchoolSchemaNameTests(TestCase):
+    """Every school gets its own schema name, even when short codes normalise alike."""
+
+    def test_colliding_short_codes(self):
+        names = [School.objects.create(name=f'School {code}', short_name=code).schema_name
+                 for code in ('St-Mary', 'ST MARY', 'st.mary')]
+        self.assertEqual(names, ['school_st_mary', 'school_st_mary_2', 'school_st_mary_3'])
+
+
+class StudentMoveStatsTests(TestCase):
+    """Moving a student keeps the incremental stats equal to a rebuild."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.schools = [school for school, _ in seed_schools(2, **SCALES['small'])]
+
+    def stats(self):
+        return (
+            sorted(SchoolStats.objects.values_list('school_id', 'student_count', 'active_loans', 'overdue_loans')),
+            sorted(ClassStats.objects.values_list('class_group_id', 'student_count', 'active_loans', 'overdue_loans')),
+        )
+
+    def assertStatsMatchRebuild(self):
+        incremental = self.stats()
+        for school in self.schools:
+            rebuild_school_stats(school)
+        self.assertEqual(incremental, self.stats())
+
+    def move(self, class_group):
+        student = Student.objects.filter(
+            school=self.schools[0], borrow_transactions__status='OVERDUE',
+        ).exclude(class_group=class_group).first()
+        self.assertTrue(student.borrow_transactions.filter(status__in=ACTIVE_STATUSES).exists())
+        student.class_group = class_group
+        student.school_id = class_group.school_id
+        student.save()
+
+    def test_move_within_school(self):
+        self.move(ClassGroup.objects.filter(school=self.schools[0]).order_by('-id').first())
+        self.assertStatsMatchRebuild()
+
+    def test_move_to_other_school(self):
+        self.move(ClassGroup.objects.filter(school=self.schools[1]).first())
+        self.assertStatsMatchRebuild()
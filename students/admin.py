@@ -1,21 +1,35 @@
 from django.contrib import admin
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Count
 from django.urls import path, reverse
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
-from .models import Student, ClassGroup
+from .models import Student, ClassGroup, ImportJob
+from .importing import VALIDATION_FAILURE
+from .tasks import run_import_job
 from schools.models import School
-import csv
-from io import StringIO
+
+
+class ClassGroupListFilter(admin.RelatedFieldListFilter):
+    """Class filter whose choices load each class's school in the same query (ClassGroup.__str__)."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin) or ('name',)
+        return [
+            (class_group.pk, str(class_group))
+            for class_group in ClassGroup.objects.select_related('school').order_by(*ordering)
+        ]
 
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ('student_id', 'name', 'class_group', 'school', 'gender', 'is_active')
-    list_filter = ('class_group', 'school', 'gender', 'is_active')
+    list_filter = (('class_group', ClassGroupListFilter), 'school', 'gender', 'is_active')
     search_fields = ('student_id', 'name', 'email', 'roll_number')
+    list_select_related = ('class_group__school', 'school')
 
     # Pass the batch import URL to the template
     def changelist_view(self, request, extra_context=None):
@@ -67,77 +81,30 @@ class StudentAdmin(admin.ModelAdmin):
                 messages.error(request, "Invalid school or class group selected.")
                 return redirect('admin:student_batch_import')
 
-            # Read CSV and perform bulk validation
-            try:
-                file_data = csv_file.read().decode('utf-8')
-                csv_reader = csv.DictReader(StringIO(file_data))
-
-                errors = []
-                valid_rows = []
-                row_num = 1
-
-                for row in csv_reader:
-                    row_num += 1
-                    student_id = row.get('student_id', '').strip()
-                    name = row.get('name', '').strip()
-
-                    if not student_id or not name:
-                        errors.append(f"Row {row_num}: Missing student_id or name")
-                        continue
-
-                    if Student.objects.filter(student_id=student_id).exists():
-                        errors.append(f"Row {row_num}: student_id {student_id} already exists")
-                        continue
-
-                    valid_rows.append({
-                        'student_id': student_id,
-                        'name': name,
-                        'gender': row.get('gender', ''),
-                        'roll_number': row.get('roll_number', ''),
-                        'email': row.get('email', ''),
-                        'phone': row.get('phone', ''),
-                        'admission_date': row.get('admission_date') or None,
-                        'is_active': row.get('is_active', 'True').lower() in ('true', '1', 'yes', 't', 'y'),
-                    })
-
-                if errors:
-                    messages.error(request, f"Validation failed ({len(errors)} errors):\n" + "\n".join(errors[:10]))
-                    if len(errors) > 10:
-                        messages.error(request, f"...and {len(errors)-10} more errors.")
-                    return redirect('admin:student_batch_import')
-
-                # Save valid rows
-                created = 0
-                for data in valid_rows:
-                    Student.objects.create(
-                        student_id=data['student_id'],
-                        name=data['name'],
-                        school=school,
-                        class_group=class_group,
-                        gender=data['gender'],
-                        roll_number=data['roll_number'],
-                        email=data['email'],
-                        phone=data['phone'],
-                        admission_date=data['admission_date'],
-                        is_active=data['is_active'],
-                    )
-                    created += 1
-
-                messages.success(request, f"Successfully imported {created} students.")
-                return redirect('admin:students_student_changelist')
-
-            except Exception as e:
-                messages.error(request, f"Error processing file: {str(e)}")
-                return redirect('admin:student_batch_import')
-
-        # GET: show the form
+            # Validated and imported by a background worker; any invalid row aborts the import
+            job = ImportJob.objects.create(
+                school=school,
+                class_group=class_group,
+                created_by=request.user,
+                file=csv_file,
+                stop_on_error=True,
+            )
+            transaction.on_commit(lambda: run_import_job.delay(job.pk, job.school_id))
+            messages.info(request, f"Import #{job.pk} queued. Progress is shown below.")
+            return redirect(f"{reverse('admin:student_batch_import')}?job={job.pk}")
+
+        # GET: show the form (and the progress of a queued import, if any)
         schools = School.objects.all()
         classes = ClassGroup.objects.none()
+        job = None
+        if request.GET.get('job', '').isdigit():
+            job = ImportJob.objects.filter(pk=request.GET['job']).first()
 
         context = {
             'title': 'Batch Import Students',
             'schools': schools,
             'classes': classes,
+            'job': job,
             'opts': self.model._meta,
             'app_label': self.model._meta.app_label,
             'model_name': self.model._meta.model_name,
@@ -155,8 +122,34 @@ class ClassGroupAdmin(admin.ModelAdmin):
     list_display = ('name', 'school', 'student_count')
     list_filter = ('school',)
     search_fields = ('name',)
+    list_select_related = ('school',)
 
-    def student_count(self, obj):
-        return obj.students.count()
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(n_students=Count('students'))
 
-    student_count.short_description = 'Students'
\ No newline at end of file
+    @admin.display(description='Students', ordering='n_students')
+    def student_count(self, obj):
+        return obj.n_students
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'school', 'class_group', 'status', 'processed_rows', 'total_rows', 'created_count', 'created_by', 'created_at')
+    list_filter = ('status', 'school')
+    list_select_related = ('school', 'class_group__school', 'created_by')
+    readonly_fields = ('total_rows', 'processed_rows', 'created_count', 'errors', 'failure', 'created_at', 'updated_at', 'finished_at')
+    actions = ['resume_jobs']
+
+    @admin.action(description="Resume selected jobs from their last committed batch")
+    def resume_jobs(self, request, queryset):
+        jobs = list(queryset.exclude(status='DONE').values_list('id', 'school_id'))
+        job_ids = [job_id for job_id, _ in jobs]
+        # A job that failed validation imported nothing; its processed_rows
+        # only count the rows checked, so it starts over (and is checked again).
+        ImportJob.objects.filter(id__in=job_ids, status='FAILED', failure=VALIDATION_FAILURE).update(
+            processed_rows=0, created_count=0, errors=[],
+        )
+        ImportJob.objects.filter(id__in=job_ids).update(status='PENDING', failure='', finished_at=None)
+        for job_id, school_id in jobs:
+            run_import_job.delay(job_id, school_id)
+        self.message_user(request, f"Queued {len(job_ids)} import job(s).")
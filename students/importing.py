@@ -0,0 +1,264 @@
+"""
+Streaming CSV import of students, shared by ImportStudentsView and
+StudentAdmin.batch_import_view.
+
+The upload is decoded and parsed row by row, validated against in-memory
+maps (the school's class names, student ids already seen) and inserted
+with bulk_create in batches, committing batch by batch so an interrupted
+ImportJob can resume (process_import_job). Existing student ids are
+looked up once per batch rather than once per row.
+"""
+import csv
+import io
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.metrics import IMPORT_DURATION, IMPORTS, ROWS_IMPORTED
+from schools.generation import bump_school_generation
+from schools.stats import apply_deltas
+from .models import ClassGroup, ImportJob, Student
+
+IMPORT_BATCH_SIZE = 1000
+VALIDATION_FAILURE = "Validation failed - nothing was imported."
+TRUE_VALUES = ('true', '1', 'yes', 't', 'y')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.rows = 0
+        self.errors = []  # [(row number, message)]
+
+    @property
+    def skipped(self):
+        return len(self.errors)
+
+    def error_messages(self, limit=None):
+        errors = self.errors if limit is None else self.errors[:limit]
+        return [f"Row {row_num}: {message}" for row_num, message in errors]
+
+
+def open_csv(upload, encoding='utf-8-sig'):
+    """Iterate the rows of an uploaded CSV file as dicts without reading it into memory."""
+    raw = getattr(upload, 'file', upload)
+    raw.seek(0)
+    text = io.TextIOWrapper(raw, encoding=encoding, newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()  # leave the upload open for Django to clean up
+
+
+class StudentImporter:
+    """
+    Import students for one school.
+
+    With `class_group` every row goes into that class; otherwise each row
+    names its class in a `class_group` column, matched case-insensitively
+    against the school's classes. Invalid rows are skipped and reported.
+    """
+
+    def __init__(self, school, class_group=None, batch_size=IMPORT_BATCH_SIZE):
+        self.school = school
+        self.class_group = class_group
+        self.batch_size = batch_size
+        self.class_ids = {}
+        self.seen_ids = set()
+        self.created_per_class = Counter()
+
+    def validate(self, upload):
+        """Check every row (including existing student ids) without writing anything."""
+        result = ImportResult()
+        self.prepare()
+        for batch in self.batches(open_csv(upload), result):
+            self.find_existing(batch, result)
+        result.errors.sort()
+        return result
+
+    def run_in_batches(self, upload, skip_rows=0, on_batch=None):
+        """
+        Import committing after every batch, so an interrupted import can be
+        resumed by passing the number of rows already processed as
+        `skip_rows`. `on_batch(result)` runs inside each batch's transaction
+        (e.g. to record progress atomically with the inserted rows).
+        """
+        result = ImportResult()
+        self.prepare()
+        rows = islice(open_csv(upload), skip_rows, None)
+        for batch in self.batches(rows, result, start_row=2 + skip_rows):
+            with transaction.atomic():
+                self.insert(batch, result)
+                self.update_stats()
+                if on_batch is not None:
+                    on_batch(result)
+        return result
+
+    def prepare(self):
+        self.seen_ids = set()
+        self.created_per_class.clear()
+        if self.class_group is None:
+            self.class_ids = {
+                name.lower(): pk
+                for pk, name in ClassGroup.objects.filter(school=self.school).values_list('id', 'name')
+            }
+
+    def batches(self, rows, result, start_row=2):
+        """Validate rows in one pass, yielding lists of (row number, Student) of at most batch_size."""
+        batch = []
+        for row_num, row in enumerate(rows, start=start_row):
+            result.rows += 1
+            student = self.build_student(row_num, row, result)
+            if student is not None:
+                batch.append((row_num, student))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        yield batch
+
+    def build_student(self, row_num, row, result):
+        student_id = (row.get('student_id') or '').strip()
+        name = (row.get('name') or '').strip()
+
+        if self.class_group is not None:
+            class_group_id = self.class_group.pk
+            if not student_id or not name:
+                result.errors.append((row_num, "Missing student_id or name"))
+                return None
+        else:
+            class_name = (row.get('class_group') or '').strip()
+            if not all([student_id, name, class_name]):
+                result.errors.append((row_num, "Missing required field (student_id, name, class_group)"))
+                return None
+            class_group_id = self.class_ids.get(class_name.lower())
+            if class_group_id is None:
+                result.errors.append((row_num, f"Class not found: '{class_name}' for student {student_id}"))
+                return None
+
+        if student_id in self.seen_ids:
+            result.errors.append((row_num, f"student_id {student_id} appears more than once in the file"))
+            return None
+        self.seen_ids.add(student_id)
+
+        admission_date = (row.get('admission_date') or '').strip() or None
+        if admission_date:
+            try:
+                admission_date = parse_date(admission_date)
+            except ValueError:
+                admission_date = None
+            if admission_date is None:
+                result.errors.append((row_num, f"Invalid admission_date for student {student_id} (use YYYY-MM-DD)"))
+                return None
+
+        is_active = row.get('is_active')
+        return Student(
+            school=self.school,
+            class_group_id=class_group_id,
+            student_id=student_id,
+            name=name,
+            gender=row.get('gender') or None,
+            roll_number=row.get('roll_number') or None,
+            email=row.get('email') or None,
+            phone=row.get('phone') or None,
+            admission_date=admission_date,
+            is_active=is_active is None or is_active.strip().lower() in TRUE_VALUES,
+        )
+
+    def find_existing(self, batch, result):
+        """Report rows whose student_id is already taken; return the rest."""
+        existing = set(Student.objects.filter(
+            student_id__in=[student.student_id for _, student in batch]
+        ).values_list('student_id', flat=True)) if batch else set()
+
+        new_students = []
+        for row_num, student in batch:
+            if student.student_id in existing:
+                result.errors.append((row_num, f"student_id {student.student_id} already exists"))
+            else:
+                new_students.append(student)
+        return new_students
+
+    def insert(self, batch, result):
+        new_students = self.find_existing(batch, result)
+        Student.objects.bulk_create(new_students, batch_size=self.batch_size)
+        for student in new_students:
+            self.created_per_class[student.class_group_id] += 1
+        result.created += len(new_students)
+
+    def update_stats(self):
+        # bulk_create skips the post_save handlers that maintain SchoolStats.
+        apply_deltas(self.school.pk, student_count=sum(self.created_per_class.values()))
+        for class_group_id, count in self.created_per_class.items():
+            apply_deltas(None, class_group_id, student_count=count)
+        self.created_per_class.clear()
+        bump_school_generation(self.school.pk)
+
+
+def _record_finished(job):
+    IMPORTS.inc(status=job.status)
+    IMPORT_DURATION.observe((job.finished_at - job.created_at).total_seconds())
+
+
+def process_import_job(job_id):
+    """
+    Run (or resume) an ImportJob. Rows already committed by an earlier,
+    interrupted run are skipped.
+    """
+    job = ImportJob.objects.select_related('school', 'class_group').get(pk=job_id)
+    if job.status in ('DONE', 'FAILED'):
+        return job
+
+    job.status = 'RUNNING'
+    job.save(update_fields=['status', 'updated_at'])
+    importer = StudentImporter(job.school, class_group=job.class_group)
+
+    try:
+        with job.file.open('rb') as upload:
+            if job.total_rows is None:
+                job.total_rows = sum(1 for _ in open_csv(upload))
+                job.save(update_fields=['total_rows', 'updated_at'])
+
+            if job.stop_on_error and job.processed_rows == 0:
+                check = importer.validate(upload)
+                if check.errors:
+                    job.errors = check.errors
+                    job.processed_rows = check.rows
+                    job.status = 'FAILED'
+                    job.failure = VALIDATION_FAILURE
+                    job.finished_at = timezone.now()
+                    job.save()
+                    _record_finished(job)
+                    return job
+
+            skip_rows = job.processed_rows
+            created_before = job.created_count
+            errors_saved = 0
+
+            def record_progress(result):
+                nonlocal errors_saved
+                job.errors.extend(result.errors[errors_saved:])
+                errors_saved = len(result.errors)
+                rows, created = job.processed_rows, job.created_count
+                job.processed_rows = skip_rows + result.rows
+                job.created_count = created_before + result.created
+                job.save(update_fields=['errors', 'processed_rows', 'created_count', 'updated_at'])
+                ROWS_IMPORTED.inc(job.created_count - created, result='created')
+                ROWS_IMPORTED.inc((job.processed_rows - rows) - (job.created_count - created), result='skipped')
+
+            importer.run_in_batches(upload, skip_rows=skip_rows, on_batch=record_progress)
+    except Exception as e:
+        job.status = 'FAILED'
+        job.failure = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'failure', 'finished_at', 'updated_at'])
+        _record_finished(job)
+        raise
+
+    job.status = 'DONE'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    _record_finished(job)
+    return job
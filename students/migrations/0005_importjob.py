@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0003_schoolstats_classstats'),
+        ('students', '0004_alter_student_gender_alter_student_student_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/%Y/%m/')),
+                ('stop_on_error', models.BooleanField(default=False, help_text='Import nothing if any row is invalid')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='[row number, message] pairs')),
+                ('failure', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('class_group', models.ForeignKey(blank=True, help_text='Assign every row to this class (otherwise read from the class_group column)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='students.classgroup')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='schools.school', verbose_name='School')),
+            ],
+            options={
+                'verbose_name': 'Import Job',
+                'verbose_name_plural': 'Import Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:08
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_search_indexes'),
+        ('students', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('name', models.TextField())), name='gin_trgm_ops'), name='student_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('student_id', models.TextField())), name='gin_trgm_ops'), name='student_student_id_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('email', models.TextField())), name='gin_trgm_ops'), name='student_email_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('roll_number', models.TextField())), name='gin_trgm_ops'), name='student_roll_number_trgm'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_student_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'name', 'id'], name='student_school_name_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.db import models
 
+from core.search import trigram_index
+
 
 class ClassGroup(models.Model):
     name = models.CharField(
@@ -110,12 +113,98 @@ class Student(models.Model):
         verbose_name="School"
     )
 
+    SEARCH_FIELDS = ('name', 'student_id', 'email', 'roll_number')
+
     class Meta:
         ordering = ['name']
         verbose_name = "Student"
         verbose_name_plural = "Students"
+        indexes = [
+            models.Index(fields=['school', 'name', 'id'], name='student_school_name_idx'),
+            trigram_index('name', 'student_name_trgm'),
+            trigram_index('student_id', 'student_student_id_trgm'),
+            trigram_index('email', 'student_email_trgm'),
+            trigram_index('roll_number', 'student_roll_number_trgm'),
+        ]
 
     def __str__(self):
         class_str = self.class_group.name if self.class_group else "No class"
         school_str = self.school.short_name if self.school and hasattr(self.school, 'short_name') else "No school"
-        return f"{self.name} ({self.student_id}) - {class_str} ({school_str})"
\ No newline at end of file
+        return f"{self.name} ({self.student_id}) - {class_str} ({school_str})"
+
+
+class ImportJob(models.Model):
+    """
+    A student CSV import processed in the background (students.tasks).
+    Progress is committed together with each batch of inserted rows, so a
+    job interrupted part-way resumes after its last committed batch.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    school = models.ForeignKey(
+        'schools.School',
+        on_delete=models.CASCADE,
+        related_name='import_jobs',
+        verbose_name="School"
+    )
+    class_group = models.ForeignKey(
+        ClassGroup,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Assign every row to this class (otherwise read from the class_group column)"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    file = models.FileField(upload_to='imports/%Y/%m/')
+    stop_on_error = models.BooleanField(
+        default=False,
+        help_text="Import nothing if any row is invalid"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="[row number, message] pairs")
+    failure = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100 if self.status == 'DONE' else 0
+        return min(100, round(self.processed_rows / self.total_rows * 100))
+
+    def as_status(self, error_limit=20):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'created': self.created_count,
+            'error_count': len(self.errors),
+            'errors': [f"Row {row_num}: {message}" for row_num, message in self.errors[:error_limit]],
+            'failure': self.failure,
+            'progress': self.progress,
+        }
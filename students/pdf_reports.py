@@ -0,0 +1,145 @@
+"""
+Printable PDF versions of the overdue and stock reports.
+
+PDFs are rendered by a Celery task (students.tasks.render_pdf_report) and
+stored under a path that includes the school's data generation (see
+schools.generation) and the date, so a stored PDF is served as long as
+the school's loans and books are unchanged and a new one is rendered
+after the first change. Rows are read in keyset batches and drawn
+straight onto the page with the reportlab canvas, one page at a time,
+so memory does not grow with the size of the report.
+"""
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from books.models import Book
+from core.pagination import keyset_iterate
+from schools.generation import school_generation
+from transactions.models import BorrowTransaction
+
+PDF_REPORT_DIR = 'reports'
+PDF_BATCH_SIZE = 1000
+
+FONT = 'Helvetica'
+FONT_SIZE = 9
+ROW_HEIGHT = 14
+MARGIN = 36
+
+
+def overdue_rows(school, today):
+    loans = BorrowTransaction.objects.overdue(today).filter(school=school).with_fine(as_of=today)
+    fields = ('student__name', 'student__class_group__name', 'book__title', 'due_date', 'overdue_days', 'accrued_fine')
+    return keyset_iterate(loans, ('due_date', 'id'), fields, PDF_BATCH_SIZE)
+
+
+def stock_rows(school, today):
+    books = Book.objects.filter(school=school)
+    for title, author, total, available in keyset_iterate(
+        books, ('title', 'id'), ('title', 'author', 'total_copies', 'available'), PDF_BATCH_SIZE
+    ):
+        yield title, author, total, available, total - available
+
+
+# name: (title, [(column header, width in points)], rows(school, today))
+PDF_REPORTS = {
+    'overdue': (
+        "Overdue Loans",
+        [("Student", 190), ("Class", 80), ("Book", 250), ("Due", 70), ("Days", 50), ("Fine (UGX)", 80)],
+        overdue_rows,
+    ),
+    'stock': (
+        "Library Stock",
+        [("Title", 300), ("Author", 200), ("Total", 70), ("Available", 70), ("Borrowed", 70)],
+        stock_rows,
+    ),
+}
+
+
+def pdf_report_path(name, school_id, today=None):
+    today = today or timezone.localdate()
+    return f'{PDF_REPORT_DIR}/{school_id}/{name}-{today:%Y%m%d}-{school_generation(school_id)}.pdf'
+
+
+def _fit(text, width):
+    text = '' if text is None else str(text)
+    while text and stringWidth(text, FONT, FONT_SIZE) > width - 4:
+        text = text[:-2] + '…'
+    return text
+
+
+def render_pdf(output, school, name, today):
+    """Write report `name` for `school` to the binary file `output`."""
+    title, columns, rows = PDF_REPORTS[name]
+    width, height = landscape(A4)
+    pdf = canvas.Canvas(output, pagesize=(width, height), pageCompression=1)
+    pdf.setTitle(f"{school.name} - {title}")
+
+    page = 0
+    y = 0
+    count = 0
+
+    def start_page():
+        nonlocal page, y
+        page += 1
+        pdf.setFont(FONT + '-Bold', 14)
+        pdf.drawString(MARGIN, height - MARGIN, f"{school.name} - {title}")
+        pdf.setFont(FONT, FONT_SIZE)
+        pdf.drawRightString(width - MARGIN, height - MARGIN, f"{today:%d %b %Y} - page {page}")
+        y = height - MARGIN - 2 * ROW_HEIGHT
+        pdf.setFont(FONT + '-Bold', FONT_SIZE)
+        x = MARGIN
+        for header, column_width in columns:
+            pdf.drawString(x, y, header)
+            x += column_width
+        pdf.line(MARGIN, y - 4, width - MARGIN, y - 4)
+        pdf.setFont(FONT, FONT_SIZE)
+        y -= ROW_HEIGHT
+
+    start_page()
+    for row in rows(school, today):
+        if y < MARGIN:
+            pdf.showPage()
+            start_page()
+        x = MARGIN
+        for value, (_, column_width) in zip(row, columns):
+            pdf.drawString(x, y, _fit(value, column_width))
+            x += column_width
+        y -= ROW_HEIGHT
+        count += 1
+
+    if y < MARGIN:
+        pdf.showPage()
+        start_page()
+    pdf.setFont(FONT + '-Bold', FONT_SIZE)
+    pdf.drawString(MARGIN, y - 4, f"{count} row(s)" if count else "Nothing to report.")
+    pdf.showPage()
+    pdf.save()
+
+
+def store_pdf_report(school, name, path):
+    """Render report `name` for `school` into default_storage at `path` (no-op if it exists)."""
+    if default_storage.exists(path):
+        return path
+    today = timezone.localdate()
+    with tempfile.TemporaryFile() as output:
+        render_pdf(output, school, name, today)
+        output.seek(0)
+        path = default_storage.save(path, File(output))
+
+    # Older renders of this report are stale now.
+    directory, filename = path.rsplit('/', 1)
+    for old in default_storage.listdir(directory)[1]:
+        if old.startswith(f'{name}-') and old != filename:
+            default_storage.delete(f'{directory}/{old}')
+    return path
+
+
+def pdf_pending_key(path):
+    """Cache flag set while the PDF at `path` is being rendered."""
+    return f'students:pdf-pending:{path}'
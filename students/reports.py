@@ -0,0 +1,160 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from schools.generation import school_generation
+from schools.models import DailyCirculation
+from transactions.models import ACTIVE_STATUSES
+from .models import ClassGroup, Student
+
+# Seconds to keep a school's class summaries; 0 disables the cache.
+CLASS_SUMMARY_CACHE_TIMEOUT = getattr(settings, 'CLASS_SUMMARY_CACHE_TIMEOUT', 300)
+
+
+def borrower_rows(school):
+    """
+    One row per student of `school` who has borrowed at least once, with
+    total / active / overdue loan counts, from a single annotated query.
+    """
+    return Student.objects.filter(school=school).annotate(
+        total_borrows=Count('loan_history'),
+        active_borrows=Count('loan_history', filter=Q(loan_history__status__in=ACTIVE_STATUSES)),
+        overdue_count=Count('loan_history', filter=Q(loan_history__status='OVERDUE')),
+    ).filter(
+        total_borrows__gt=0
+    ).order_by(
+        'class_group__name', 'name', 'id'
+    ).values(
+        'id', 'name', 'student_id', 'class_group_id', 'class_group__name',
+        'total_borrows', 'active_borrows', 'overdue_count',
+    )
+
+
+def borrowing_by_class(school):
+    """
+    Group borrower_rows() by class, with per-class totals. The page lists
+    every borrower, so the rows are all held in memory; the query count
+    does not depend on the number of students or classes.
+    """
+    class_data = []
+    for (class_id, class_name), rows in groupby(
+        borrower_rows(school), key=lambda row: (row['class_group_id'], row['class_group__name'])
+    ):
+        borrowers = list(rows)
+        class_data.append({
+            'class_group': {'id': class_id, 'name': class_name or "No class"},
+            'borrower_count': len(borrowers),
+            'active_borrows': sum(row['active_borrows'] for row in borrowers),
+            'overdue_count': sum(row['overdue_count'] for row in borrowers),
+            'borrowers': borrowers,
+        })
+    return class_data
+
+
+# Dashboard chart ranges (?range=...) and their titles. The chart reads the
+# DailyCirculation rollup, so even a year is at most 366 rows.
+CHART_RANGES = {
+    'week': 'This week',
+    'month': 'Last 30 days',
+    'term': 'Last 13 weeks',
+    'year': 'Last 12 months',
+}
+
+
+def _chart_buckets(period, today):
+    """(first day, last day, day -> (bar key, label)) for a chart range."""
+    if period == 'month':
+        return today - timedelta(days=29), today, lambda day: (day, day.strftime('%d'))
+    if period == 'term':
+        def week(day):
+            monday = day - timedelta(days=day.weekday())
+            return monday, monday.strftime('%d %b')
+        return today - timedelta(days=today.weekday(), weeks=12), today, week
+    if period == 'year':
+        first = today.replace(day=1)
+        for _ in range(11):
+            first = (first - timedelta(days=1)).replace(day=1)
+        return first, today, lambda day: (day.replace(day=1), day.strftime('%b'))
+    first = today - timedelta(days=today.weekday())
+    return first, first + timedelta(days=6), lambda day: (day, day.strftime('%a'))
+
+
+def circulation_chart(school, today, period='week'):
+    """
+    [(label, loans issued, bar height %)] for the dashboard chart over
+    one of CHART_RANGES (days of this week / the last 30 days, weeks of
+    the last term, months of the last year), from the DailyCirculation
+    rollup.
+    """
+    first, last, bucket = _chart_buckets(period, today)
+    issued = dict(DailyCirculation.objects.filter(
+        school=school, date__range=(first, last)
+    ).values_list('date', 'issued'))
+
+    bars = {}
+    day = first
+    while day <= last:
+        key, label = bucket(day)
+        count = bars.get(key, (label, 0))[1]
+        bars[key] = (label, count + issued.get(day, 0))
+        day += timedelta(days=1)
+
+    max_count = max(count for _, count in bars.values()) or 1
+    return [(label, count, count / max_count * 100) for label, count in bars.values()]
+
+
+def class_summary_cache_key(school_id):
+    return f'students:class-summaries:{school_id}:{school_generation(school_id)}'
+
+
+def class_summaries(school):
+    """
+    Student, borrower, active and overdue counts for every class of
+    `school` from one grouped query, cached until the school's data
+    generation changes.
+    """
+    key = class_summary_cache_key(school.pk) if school else None
+    if key and CLASS_SUMMARY_CACHE_TIMEOUT:
+        summaries = cache.get(key)
+        if summaries is not None:
+            return summaries
+
+    borrowed = Q(students__loan_history__isnull=False)
+    classes = ClassGroup.objects.filter(school=school).annotate(
+        total_students=Count('students', distinct=True),
+        borrower_count=Count('students', filter=borrowed, distinct=True),
+        active_borrows=Count('students__loan_history', filter=Q(students__loan_history__status__in=ACTIVE_STATUSES)),
+        overdue=Count('students__loan_history', filter=Q(students__loan_history__status='OVERDUE')),
+    ).order_by('name')
+
+    summaries = [
+        {
+            'class_group': {'id': cls.id, 'name': cls.name},
+            'total_students': cls.total_students,
+            'borrower_count': cls.borrower_count,
+            'active_borrows': cls.active_borrows,
+            'overdue': cls.overdue,
+        }
+        for cls in classes.only('id', 'name')
+    ]
+    if key and CLASS_SUMMARY_CACHE_TIMEOUT:
+        cache.set(key, summaries, CLASS_SUMMARY_CACHE_TIMEOUT)
+    return summaries
+
+
+def class_students(school, class_group):
+    """Students of one class with their borrowing counts, in one query."""
+    students = list(Student.objects.filter(
+        school=school,
+        class_group=class_group,
+    ).annotate(
+        total_borrows=Count('loan_history'),
+        active_borrows=Count('loan_history', filter=Q(loan_history__status__in=ACTIVE_STATUSES)),
+        overdue_count=Count('loan_history', filter=Q(loan_history__status='OVERDUE')),
+    ).only('id', 'name', 'student_id').order_by('name'))
+    for student in students:
+        student.has_borrowed = student.total_borrows > 0
+    return students
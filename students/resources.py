@@ -1,47 +1,96 @@
 # students/resources.py
-from import_export import resources
+from import_export import resources, widgets
 from import_export.fields import Field
+from import_export.instance_loaders import BaseInstanceLoader
 from .models import Student, ClassGroup
+from schools.generation import bump_school_generation
 from schools.models import School
+from schools.stats import rebuild_school_stats
+
+
+class PrefetchedStudentLoader(BaseInstanceLoader):
+    """Serve existing students from the map built in before_import (no per-row query)."""
+
+    def get_instance(self, row):
+        return self.resource.existing_students.get(self.resource.fields['student_id'].clean(row))
 
 
 class FullStudentImportResource(resources.ModelResource):
-    # Special handling for class_group (imported as name string)
-    class_group = Field(column_name='class_group', attribute='class_group')
+    # Special handling for class_group (imported as name string, resolved to a pk)
+    class_group = Field(column_name='class_group', attribute='class_group_id', widget=widgets.IntegerWidget())
 
-    # Special handling for school (imported as name or short_name)
-    school = Field(column_name='school', attribute='school')
+    # Special handling for school (imported as name or short_name, resolved to a pk)
+    school = Field(column_name='school', attribute='school_id', widget=widgets.IntegerWidget())
 
     class Meta:
         model = Student
         # NO field restriction → ALL fields are importable if present in CSV
         import_id_fields = ('student_id',)  # unique key for updates
+        instance_loader_class = PrefetchedStudentLoader
         skip_unchanged = True
         report_skipped = True
+        use_bulk = True
+        batch_size = 1000
+
+    def before_import(self, dataset, **kwargs):
+        # Resolve names once per import instead of once per row
+        self.schools = {school.pk: school for school in School.objects.all()}
+        self.class_groups = {
+            cg.pk: cg for cg in ClassGroup.objects.all()
+        }
+        for cg in self.class_groups.values():
+            cg.school = self.schools[cg.school_id]
+        self.class_ids = {cg.name.lower(): pk for pk, cg in self.class_groups.items()}
+        self.school_ids = {school.short_name.lower(): pk for pk, school in self.schools.items()}
+        # full names win over short names
+        self.school_ids.update({school.name.lower(): pk for pk, school in self.schools.items()})
 
-    def before_import_row(self, row, row_result, **kwargs):
-        # Convert class_group name → actual object PK
+        # Every student the dataset may update, in one query
+        self.existing_students = {}
+        if 'student_id' in (dataset.headers or []):
+            student_field = self.fields['student_id']
+            ids = [student_field.clean(row) for row in dataset.dict]
+            self.existing_students = {
+                student.student_id: student for student in Student.objects.filter(student_id__in=ids)
+            }
+        self.affected_school_ids = {student.school_id for student in self.existing_students.values()}
+
+    def before_import_row(self, row, row_result=None, **kwargs):
+        # Convert class_group name → PK
         class_name = row.get('class_group')
         if class_name:
-            try:
-                cg = ClassGroup.objects.get(name__iexact=class_name.strip())
-                row['class_group'] = cg.pk
-            except ClassGroup.DoesNotExist:
-                row['class_group'] = None  # or raise error
+            row['class_group'] = self.class_ids.get(class_name.strip().lower())  # unknown class → no class
 
         # Convert school name/short_name → PK
         school_val = row.get('school')
         if school_val:
-            try:
-                sch = School.objects.get(name__iexact=school_val.strip())
-                row['school'] = sch.pk
-            except School.DoesNotExist:
-                try:
-                    sch = School.objects.get(short_name__iexact=school_val.strip())
-                    row['school'] = sch.pk
-                except School.DoesNotExist:
-                    row['school'] = None
+            school_id = self.school_ids.get(school_val.strip().lower())
+            if school_id is None:
+                raise ValueError(f"School not found: '{school_val}'")
+            row['school'] = school_id
+            self.affected_school_ids.add(school_id)
+
+    def import_instance(self, instance, row, **kwargs):
+        super().import_instance(instance, row, **kwargs)
+        # Attach the preloaded related objects so str(instance) in the row
+        # results does not fetch them again.
+        instance.class_group = self.class_groups.get(instance.class_group_id)
+        if instance.school_id in self.schools:
+            instance.school = self.schools[instance.school_id]
+
+    def get_bulk_update_fields(self):
+        # bulk_update() refuses the primary key
+        return [f for f in super().get_bulk_update_fields() if f != Student._meta.pk.name]
+
+    def after_import(self, dataset, result, **kwargs):
+        # Bulk create/update bypasses the signals that maintain SchoolStats,
+        # so recount the schools this import touched.
+        if kwargs.get('dry_run') or result.has_errors():
+            return
+        for school in School.objects.filter(id__in=self.affected_school_ids):
+            rebuild_school_stats(school)
+        bump_school_generation(*self.affected_school_ids)
 
     def after_import_row(self, row, row_result, **kwargs):
         # Optional: any post-import cleanup or logging
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,26 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from schools.models import School
+from schools.tenancy import school_schema
+from .importing import process_import_job
+from .pdf_reports import pdf_pending_key, store_pdf_report
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True, ignore_result=True)
+def run_import_job(job_id, school_id=None):
+    """Process an ImportJob; redelivered (and resumed) if the worker dies mid-import."""
+    with school_schema(school_id):
+        process_import_job(job_id)
+
+
+@shared_task(ignore_result=True)
+def render_pdf_report(school_id, name, path):
+    """Render a PDF report into storage at `path` (see students.pdf_reports)."""
+    try:
+        school = School.objects.filter(pk=school_id).first()
+        if school is not None:
+            with school_schema(school):
+                store_pdf_report(school, name, path)
+    finally:
+        cache.delete(pdf_pending_key(path))
@@ -1,3 +1,57 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase
 
-# Create your tests here.
+from core.benchmark import QUERY_BUDGETS, QueryBudgetTestMixin, measure_import, request, view_targets
+from core.seeding import SCALES, seed_schools
+from students.models import Student
+
+
+class StudentViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Librarian pages of the students app."""
+    target_prefixes = ('students:',)
+
+
+class ReportQueryScalingTests(QueryBudgetTestMixin, TestCase):
+    """The borrowing-by-class report spends the same queries for a school four times the size."""
+    target_prefixes = ('students:reports_overview',)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        larger = dict(SCALES[cls.scale], students_per_class=SCALES[cls.scale]['students_per_class'] * 4)
+        [(cls.larger_school, cls.larger_librarian)] = seed_schools(1, start=2, **larger)
+
+    def report_queries(self, school, librarian):
+        client = Client()
+        client.force_login(librarian)
+        [target] = [target for target in view_targets(school) if target.name == 'students:reports_overview']
+        cache.clear()
+        response, queries = request(client, target)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_queries_independent_of_students(self):
+        queries = self.report_queries(self.school, self.librarian)
+        self.assertLessEqual(queries, QUERY_BUDGETS['students:reports_overview'])
+        self.assertEqual(self.report_queries(self.larger_school, self.larger_librarian), queries)
+
+
+class StudentImportTests(TestCase):
+    """The CSV import spends a fixed number of queries per batch, however many rows the batch holds."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, _)] = seed_schools(1, **dict(SCALES['small'], loans_per_student=0))
+
+    def test_queries_per_batch_not_per_row(self):
+        # Batches small enough for one INSERT each even on SQLite, whose
+        # bound-parameter limit makes bulk_create split larger ones.
+        students = Student.objects.filter(school=self.school).count()
+        small = measure_import(self.school, 60, batch_size=20)
+        self.assertEqual((small['rows'], small['created']), (60, 60))
+        Student.objects.filter(student_id__contains='-IMP').delete()
+
+        large = measure_import(self.school, 240, batch_size=80)
+        self.assertEqual((large['rows'], large['created']), (240, 240))
+        self.assertEqual(large['queries'], small['queries'])
+        self.assertEqual(Student.objects.filter(school=self.school).count(), students + 240)
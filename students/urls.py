@@ -20,11 +20,13 @@ urlpatterns = [
     # Newly added for the missing buttons
     path('returns/', views.returns_list, name='returns_list'),                  # Returns page
     path('reports/', views.reports_overview, name='reports_overview'),         # Reports page
+    path('reports/<str:name>.pdf', views.report_pdf, name='report_pdf'),
     path('settings/', views.librarian_settings, name='librarian_settings'),    # Settings page
     path('class-lists/', views.class_lists_overview, name='class_lists_overview'),
     path('class/<int:class_id>/', views.class_detail, name='class_detail'),
     path('library-stock/', views.library_stock, name='library_stock'),
     path('search/', views.student_search, name='student_search'),
     path('import-students/', views.ImportStudentsView.as_view(), name='import_students'),
+    path('import-jobs/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
     path('bulk-return/', views.bulk_return, name='bulk_return'),
 ]
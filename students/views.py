@@ -1,17 +1,40 @@
+from functools import partial
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.db import transaction
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db.models import Q, Count, F, Sum
-from django.db.models.functions import ExtractWeekDay
+from django.db.models import F, Q, Count, Sum
 from django.contrib import messages
 from django.views import View
-from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Student, ClassGroup
+from django.utils.decorators import method_decorator
+from .models import Student, ClassGroup, ImportJob
 from books.models import Book
-from transactions.models import BorrowTransaction
+from transactions.models import DEFAULT_DAILY_FINE, BorrowTransaction, LoanHistory
+from transactions.services import issue_books, parse_quantities, return_loans
+from schools.models import ClassStats
+from schools.decorators import librarian_required
+from schools.stats import get_school_stats
 from .forms import BookForm
-import csv
-from io import StringIO
+from .pdf_reports import PDF_REPORTS, pdf_pending_key, pdf_report_path
+from .tasks import render_pdf_report, run_import_job
+from .reports import CHART_RANGES, borrowing_by_class, circulation_chart, class_students, class_summaries
+from core.pagination import keyset_page
+from core.search import search
+
+# Keyset orderings (see core.pagination) and the columns list pages load.
+LOAN_ORDERING = ('-issued_date', 'id')
+STUDENT_ORDERING = ('name', 'id')
+BOOK_ORDERING = ('title', 'id')
+STUDENT_LIST_FIELDS = ('id', 'name', 'student_id', 'email', 'class_group__name')
+BOOK_STOCK_FIELDS = ('id', 'title', 'author', 'total_copies', 'available')
+
+# Seconds before a PDF render that never finished may be scheduled again.
+PDF_PENDING_TIMEOUT = 600
 
 
 @login_required
@@ -27,75 +50,62 @@ def student_dashboard(request):
             'error_message': 'No student profile found. Contact the librarian.'
         })
 
-    borrows = BorrowTransaction.objects.filter(student=student).order_by('-issued_date')
-
-    borrowed_count = borrows.filter(status='ISSUED').count()
-    overdue_count = borrows.filter(status='OVERDUE').count()
-    total_fine = sum(b.fine_amount for b in borrows if not b.fine_paid)
+    loans = LoanHistory.objects.filter(student=student)
+    totals = loans.aggregate(
+        borrowed_count=Count('id', filter=Q(status='ISSUED')),
+        overdue_count=Count('id', filter=Q(status='OVERDUE')),
+        total_fine=Sum('fine_amount', filter=Q(fine_paid=False)),
+    )
+    borrows = keyset_page(
+        request,
+        loans.select_related('book').only('id', 'issued_date', 'due_date', 'status', 'book__title'),
+        LOAN_ORDERING,
+    )
 
     context = {
         'borrows': borrows,
-        'borrowed_count': borrowed_count,
-        'overdue_count': overdue_count,
-        'total_fine': total_fine,
+        'borrowed_count': totals['borrowed_count'],
+        'overdue_count': totals['overdue_count'],
+        'total_fine': totals['total_fine'] or 0,
         'student': student,
     }
     return render(request, 'dashboard/student.html', context)
 
 
-@login_required
+@librarian_required
 def librarian_dashboard(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
+    school = request.school
     today = timezone.now().date()
+    chart_range = request.GET.get('range')
+    if chart_range not in CHART_RANGES:
+        chart_range = 'week'
 
-    class_stats = Student.objects.filter(school=school).values(
-        'class_group__name'
-    ).annotate(
-        student_count=Count('id')
+    stats = get_school_stats(school)
+
+    class_stats = ClassStats.objects.filter(school=school).values(
+        'class_group__name', 'student_count'
     ).order_by('class_group__name')
 
-    total_students = Student.objects.filter(school=school).count()
-    total_classes = class_stats.count()
+    total_students = stats.student_count
+    total_classes = stats.class_count
 
-    total_books = Book.objects.filter(school=school).count()
+    total_books = stats.book_count
     available_books = Book.objects.filter(school=school, available__gt=0).order_by('-available')
     low_stock_books = Book.objects.filter(school=school, available__lte=2)
-    low_stock_count = low_stock_books.count()
 
     borrowed_books = BorrowTransaction.objects.filter(
-        book__school=school,
+        school=school,
         status__in=['ISSUED', 'OVERDUE']
     ).select_related('student', 'book').order_by('-issued_date')
 
-    total_borrowed = borrowed_books.count()
-    today_issued = borrowed_books.filter(issued_date=today).count()
-    overdue_count = borrowed_books.filter(status='OVERDUE').count()
+    total_borrowed = stats.active_loans
+    today_issued = stats.issued_on(today)
+    overdue_count = stats.overdue_loans
 
     monthly_student_growth = total_students // 10
 
-    # Weekly borrowings graph data
-    week_start = today - timezone.timedelta(days=today.weekday())
-    weekly_data = BorrowTransaction.objects.filter(
-        book__school=school,
-        issued_date__gte=week_start,
-        issued_date__lte=today
-    ).annotate(
-        weekday=ExtractWeekDay('issued_date')
-    ).values('weekday').annotate(
-        count=Count('id')
-    ).order_by('weekday')
-
-    chart_data = [0] * 7
-    for entry in weekly_data:
-        weekday = entry['weekday'] - 1
-        chart_data[weekday] = entry['count']
-
-    max_count = max(chart_data) if any(chart_data) else 1
-    scaled_heights = [(count / max_count * 100) for count in chart_data]
-
+    # Querysets and callables below are only evaluated when the template's
+    # {% schoolcache %} fragment misses.
     context = {
         'class_stats': class_stats,
         'total_students': total_students,
@@ -108,31 +118,37 @@ def librarian_dashboard(request):
         'today_issued': today_issued,
         'overdue_count': overdue_count,
         'total_books': total_books,
-        'low_stock_count': low_stock_count,
+        'low_stock_count': low_stock_books.count,
+        'on_time_percentage': stats.on_time_percentage,
         'school': school,
-        'weekly_borrow_counts': chart_data,
-        'weekly_scaled_heights': scaled_heights,
+        'chart_range': chart_range,
+        'chart_title': CHART_RANGES[chart_range],
+        'chart_ranges': CHART_RANGES,
+        'chart_data': partial(circulation_chart, school, today, chart_range),
     }
     return render(request, 'dashboard/librarian.html', context)
 
 
-@login_required
-def student_search(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
+def _search_students(school, query):
+    """Ranked search over the school's students, also matching on class name."""
+    students = Student.objects.filter(school=school).select_related('class_group').only(*STUDENT_LIST_FIELDS)
+    class_ids = []
+    if query.strip():
+        class_ids = list(ClassGroup.objects.filter(
+            school=school, name__icontains=query.strip()
+        ).values_list('id', flat=True))
+    return search(
+        students, query, Student.SEARCH_FIELDS,
+        also=Q(class_group_id__in=class_ids) if class_ids else None,
+    )
+
 
+@librarian_required
+def student_search(request):
     query = request.GET.get('q', '')
-    school = request.user.school_profile.school
-
-    students = Student.objects.filter(school=school)
-    if query:
-        students = students.filter(
-            Q(name__icontains=query) |
-            Q(student_id__icontains=query) |
-            Q(class_group__name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(roll_number__icontains=query)
-        )
+    students = _search_students(request.school, query)
+    if not query.strip():
+        students = keyset_page(request, students, STUDENT_ORDERING)
 
     context = {
         'students': students,
@@ -142,21 +158,12 @@ def student_search(request):
     return render(request, 'students/search.html', context)
 
 
-@login_required
+@librarian_required
 def student_list(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
     query = request.GET.get('q', '')
-
-    students = Student.objects.filter(school=school)
-    if query:
-        students = students.filter(
-            Q(name__icontains=query) |
-            Q(student_id__icontains=query) |
-            Q(class_group__name__icontains=query)
-        )
+    students = _search_students(request.school, query)
+    if not query.strip():
+        students = keyset_page(request, students, STUDENT_ORDERING)
 
     context = {
         'students': students,
@@ -165,12 +172,9 @@ def student_list(request):
     return render(request, 'students/list.html', context)
 
 
-@login_required
+@librarian_required
 def add_book(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
+    school = request.school
 
     if request.method == 'POST':
         form = BookForm(request.POST)
@@ -188,12 +192,9 @@ def add_book(request):
     return render(request, 'dashboard/add_book.html', context)
 
 
-@login_required
+@librarian_required
 def issue_book(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
+    school = request.school
 
     if request.method == 'POST':
         student_id = request.POST.get('student_id')
@@ -203,34 +204,12 @@ def issue_book(request):
             student = Student.objects.get(id=student_id, school=school)
             due_date = timezone.datetime.strptime(due_date_str, '%Y-%m-%d').date()
 
-            issued_total = 0
-            warnings = []
-
-            for book in Book.objects.filter(school=school, available__gt=0):
-                qty_key = f"qty_{book.id}"
-                qty_str = request.POST.get(qty_key, "0")
-                try:
-                    qty = int(qty_str)
-                    if qty > 0:
-                        if qty > book.available:
-                            warnings.append(f"Only {book.available} copy/copies of '{book.title}' available (requested {qty}).")
-                            qty = book.available
-
-                        for _ in range(qty):
-                            BorrowTransaction.objects.create(
-                                student=student,
-                                book=book,
-                                issued_date=timezone.now().date(),
-                                due_date=due_date,
-                                status='ISSUED'
-                            )
-
-                        book.available -= qty
-                        book.save(update_fields=['available'])
-                        issued_total += qty
-
-                except ValueError:
-                    pass
+            issued_total, warnings = issue_books(
+                student,
+                parse_quantities(request.POST),
+                due_date,
+                issued_by=request.user,
+            )
 
             if issued_total > 0:
                 messages.success(request, f"{issued_total} book cop{'y' if issued_total == 1 else 'ies'} issued to {student.name}!")
@@ -241,13 +220,13 @@ def issue_book(request):
 
             return redirect('students:librarian_dashboard')
 
-        except (Student.DoesNotExist, Book.DoesNotExist):
+        except Student.DoesNotExist:
             messages.error(request, 'Invalid student or book selection.')
         except ValueError:
             messages.error(request, 'Invalid due date format.')
 
-    students = Student.objects.filter(school=school).order_by('name')
-    books = Book.objects.filter(school=school, available__gt=0).order_by('title')
+    students = Student.objects.filter(school=school).select_related('class_group').only(*STUDENT_LIST_FIELDS).order_by('name')
+    books = Book.objects.filter(school=school, available__gt=0).select_related('category').only(*BOOK_STOCK_FIELDS, 'category__name').order_by('title')
 
     context = {
         'students': students,
@@ -256,112 +235,71 @@ def issue_book(request):
     return render(request, 'dashboard/issue_book.html', context)
 
 
-@login_required
+@librarian_required
 def return_book(request, transaction_id):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    transaction = get_object_or_404(
-        BorrowTransaction,
+    borrow = get_object_or_404(
+        BorrowTransaction.objects.select_related('student', 'book'),
         id=transaction_id,
-        book__school=request.user.school_profile.school,
+        school=request.school,
         status__in=['ISSUED', 'OVERDUE']
     )
 
     if request.method == 'POST':
         return_date = timezone.now().date()
-        transaction.returned_date = return_date
-        transaction.status = 'RETURNED'
-
-        if return_date > transaction.due_date:
-            days_late = (return_date - transaction.due_date).days
-            transaction.fine_amount = days_late * 1000
-            transaction.fine_paid = False
-            messages.warning(request, f"Returned {days_late} day(s) late. Fine: {transaction.fine_amount} UGX")
+        if return_loans(BorrowTransaction.objects.filter(pk=borrow.pk), return_date):
+            if return_date > borrow.due_date:
+                days_late = (return_date - borrow.due_date).days
+                messages.warning(request, f"Returned {days_late} day(s) late. Fine: {days_late * DEFAULT_DAILY_FINE} UGX")
+            else:
+                messages.success(request, "Book returned successfully.")
         else:
-            messages.success(request, "Book returned successfully.")
-
-        transaction.save()
-
-        transaction.book.available = F('available') + 1
-        transaction.book.save(update_fields=['available'])
+            messages.warning(request, "This book has already been returned.")
 
         next_url = request.GET.get('next', 'students:librarian_dashboard')
         return redirect(next_url)
 
     context = {
-        'transaction': transaction,
-        'student': transaction.student,
-        'book': transaction.book,
-        'days_left': (transaction.due_date - timezone.now().date()).days if transaction.due_date >= timezone.now().date() else 0,
+        'transaction': borrow,
+        'student': borrow.student,
+        'book': borrow.book,
+        'days_left': (borrow.due_date - timezone.now().date()).days if borrow.due_date >= timezone.now().date() else 0,
     }
     return render(request, 'dashboard/return_book_confirm.html', context)
 
 
-@login_required
+@librarian_required
 def returns_list(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
-    borrowed_books = BorrowTransaction.objects.filter(
-        book__school=school,
-        status__in=['ISSUED', 'OVERDUE']
-    ).select_related('student', 'book').order_by('-issued_date')
+    school = request.school
+    borrowed_books = keyset_page(
+        request,
+        BorrowTransaction.objects.filter(
+            school=school,
+            status__in=['ISSUED', 'OVERDUE']
+        ).select_related('student', 'book').only(
+            'id', 'issued_date', 'due_date', 'status', 'student__name', 'book__title'
+        ),
+        LOAN_ORDERING,
+    )
 
     context = {
         'borrowed_books': borrowed_books,
+        'total_borrowed': get_school_stats(school).active_loans,
         'title': 'Returns & Borrowed Books',
     }
     return render(request, 'dashboard/returns_list.html', context)
 
 
-@login_required
+@librarian_required
 def reports_overview(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
-
-    total_students = Student.objects.filter(school=school).count()
-    total_books = Book.objects.filter(school=school).count()
-    total_borrowed = BorrowTransaction.objects.filter(
-        book__school=school, status__in=['ISSUED', 'OVERDUE']
-    ).count()
-    overdue_count = BorrowTransaction.objects.filter(
-        book__school=school, status='OVERDUE'
-    ).count()
-
-    on_time_returns = BorrowTransaction.objects.filter(
-        book__school=school,
-        status='RETURNED',
-        returned_date__lte=F('due_date')
-    ).count()
+    school = request.school
 
-    total_returns = BorrowTransaction.objects.filter(
-        book__school=school, status='RETURNED'
-    ).count()
+    stats = get_school_stats(school)
 
-    on_time_percentage = round((on_time_returns / total_returns * 100) if total_returns > 0 else 0, 1)
-
-    students_with_borrows = Student.objects.filter(
-        school=school,
-        borrow_transactions__isnull=False
-    ).distinct().select_related('class_group').order_by('class_group__name', 'name')
-
-    for student in students_with_borrows:
-        student.total_borrows = student.borrow_transactions.count()
-        student.active_borrows = student.borrow_transactions.filter(status__in=['ISSUED', 'OVERDUE']).count()
-        student.overdue_count = student.borrow_transactions.filter(status='OVERDUE').count()
-
-    class_borrow_stats = ClassGroup.objects.filter(
-        school=school,
-        students__borrow_transactions__isnull=False
-    ).distinct().annotate(
-        borrower_count=Count('students__borrow_transactions', distinct=True),
-        active_borrows=Count('students__borrow_transactions', filter=Q(students__borrow_transactions__status__in=['ISSUED', 'OVERDUE'])),
-        overdue_count=Count('students__borrow_transactions', filter=Q(students__borrow_transactions__status='OVERDUE'))
-    ).order_by('name')
+    total_students = stats.student_count
+    total_books = stats.book_count
+    total_borrowed = stats.active_loans
+    overdue_count = stats.overdue_loans
+    on_time_percentage = stats.on_time_percentage
 
     context = {
         'title': 'Library Reports',
@@ -370,17 +308,36 @@ def reports_overview(request):
         'total_borrowed': total_borrowed,
         'overdue_count': overdue_count,
         'on_time_percentage': on_time_percentage,
-        'students_with_borrows': students_with_borrows,
-        'class_borrow_stats': class_borrow_stats,
+        'class_data': partial(borrowing_by_class, school),
+        'export_statuses': BorrowTransaction.STATUS_CHOICES,
     }
     return render(request, 'dashboard/reports.html', context)
 
 
-@login_required
+@librarian_required
+def report_pdf(request, name):
+    """
+    The school's current PDF of report `name` (see students.pdf_reports).
+    If it has not been rendered for the current data yet, schedule that
+    once and show a page that reloads until the PDF is ready.
+    """
+    if name not in PDF_REPORTS:
+        raise Http404("Unknown report.")
+    school = request.school
+    path = pdf_report_path(name, school.pk)
+    if not default_storage.exists(path):
+        if cache.add(pdf_pending_key(path), True, PDF_PENDING_TIMEOUT):
+            render_pdf_report.delay(school.pk, name, path)
+        if not default_storage.exists(path):
+            title = PDF_REPORTS[name][0]
+            return render(request, 'dashboard/report_pending.html', {'title': title}, status=202)
+
+    filename = path.rsplit('/', 1)[1]
+    return FileResponse(default_storage.open(path, 'rb'), content_type='application/pdf', filename=filename)
+
+
+@librarian_required
 def librarian_settings(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
     context = {
         'title': 'Librarian Settings',
         'user': request.user,
@@ -388,60 +345,23 @@ def librarian_settings(request):
     return render(request, 'dashboard/settings.html', context)
 
 
-@login_required
+@librarian_required
 def class_lists_overview(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
-
-    classes = ClassGroup.objects.filter(school=school).order_by('name')
-
-    class_summaries = []
-    for cls in classes:
-        total_students = cls.students.count()
-        borrower_count = cls.students.filter(borrow_transactions__isnull=False).distinct().count()
-        active_borrows = BorrowTransaction.objects.filter(
-            student__class_group=cls,
-            status__in=['ISSUED', 'OVERDUE']
-        ).count()
-        overdue = BorrowTransaction.objects.filter(
-            student__class_group=cls,
-            status='OVERDUE'
-        ).count()
-
-        class_summaries.append({
-            'class_group': cls,
-            'total_students': total_students,
-            'borrower_count': borrower_count,
-            'active_borrows': active_borrows,
-            'overdue': overdue,
-        })
+    school = request.school
 
     context = {
         'title': 'Class Lists',
-        'class_summaries': class_summaries,
+        'class_summaries': partial(class_summaries, school),
     }
     return render(request, 'dashboard/class_lists_overview.html', context)
 
 
-@login_required
+@librarian_required
 def class_detail(request, class_id):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
+    school = request.school
     class_group = get_object_or_404(ClassGroup, id=class_id, school=school)
 
-    students = Student.objects.filter(
-        school=school,
-        class_group=class_group
-    ).order_by('name')
-
-    for student in students:
-        student.has_borrowed = student.borrow_transactions.exists()
-        student.active_borrows = student.borrow_transactions.filter(status__in=['ISSUED', 'OVERDUE']).count()
-        student.overdue_count = student.borrow_transactions.filter(status='OVERDUE').count()
+    students = class_students(school, class_group)
 
     context = {
         'title': f'{class_group.name} - Student List',
@@ -451,32 +371,26 @@ def class_detail(request, class_id):
     return render(request, 'dashboard/class_detail.html', context)
 
 
-@login_required
+@librarian_required
 def library_stock(request):
-    if not request.user.school_profile.is_librarian:
-        return redirect('students:student_dashboard')
-
-    school = request.user.school_profile.school
+    school = request.school
 
-    stock_summary = Book.objects.filter(school=school).aggregate(
-        total_copies=Sum('total_copies'),
-        available_copies=Sum('available'),
-    )
+    stats = get_school_stats(school)
 
-    total_copies = stock_summary['total_copies'] or 0
-    available_copies = stock_summary['available_copies'] or 0
+    total_copies = stats.total_copies
+    available_copies = stats.available_copies
     borrowed_copies = total_copies - available_copies
 
     available_percentage = (available_copies / total_copies * 100) if total_copies > 0 else 0
     borrowed_percentage = (borrowed_copies / total_copies * 100) if total_copies > 0 else 0
 
-    low_stock_books = Book.objects.filter(school=school, available__lte=2).order_by('available', 'title')
-    for book in low_stock_books:
-        book.borrowed_copies = book.total_copies - book.available
+    books = Book.objects.filter(school=school).only(*BOOK_STOCK_FIELDS).annotate(
+        borrowed_copies=F('total_copies') - F('available')
+    )
+    # Evaluated only when the template's {% schoolcache %} fragment misses.
+    low_stock_books = books.filter(available__lte=2).order_by('available', 'title')
 
-    all_books = Book.objects.filter(school=school).order_by('title')
-    for book in all_books:
-        book.borrowed_copies = book.total_copies - book.available
+    all_books = keyset_page(request, books, BOOK_ORDERING)
 
     context = {
         'title': 'Library Stock Summary',
@@ -495,108 +409,55 @@ def library_stock(request):
 #   Simplified Student Import (only 3 required fields)
 # ────────────────────────────────────────────────
 
-class ImportStudentsView(LoginRequiredMixin, View):
+@method_decorator(librarian_required(message="Only librarians can import students."), name='dispatch')
+class ImportStudentsView(View):
     template_name = 'students/import_students.html'
 
     def get(self, request):
-        if not request.user.school_profile.is_librarian:
-            messages.error(request, "Only librarians can import students.")
-            return redirect('students:librarian_dashboard')
-        return render(request, self.template_name)
+        job = None
+        if request.GET.get('job', '').isdigit():
+            job = ImportJob.objects.filter(
+                pk=request.GET['job'], school=request.school
+            ).first()
+        return render(request, self.template_name, {'job': job})
 
     def post(self, request):
-        if not request.user.school_profile.is_librarian:
-            messages.error(request, "Only librarians can import students.")
-            return redirect('students:librarian_dashboard')
-
         file = request.FILES.get('csv_file')
         if not file:
             messages.error(request, "No file uploaded.")
             return render(request, self.template_name)
 
-        school = request.user.school_profile.school
+        school = request.school
 
-        try:
-            file_data = file.read().decode('utf-8')
-            csv_file = StringIO(file_data)
-            reader = csv.DictReader(csv_file)
-
-            created = 0
-            skipped = 0
-            warnings = []
-
-            for row in reader:
-                student_id = row.get('student_id', '').strip()
-                name = row.get('name', '').strip()
-                class_name = row.get('class_group', '').strip()
-
-                if not all([student_id, name, class_name]):
-                    skipped += 1
-                    warnings.append(f"Skipped row (missing required field): {row}")
-                    continue
-
-                try:
-                    class_group = ClassGroup.objects.get(school=school, name__iexact=class_name)
-                except ClassGroup.DoesNotExist:
-                    skipped += 1
-                    warnings.append(f"Class not found: '{class_name}' for student {student_id}")
-                    continue
-
-                if Student.objects.filter(school=school, student_id=student_id).exists():
-                    skipped += 1
-                    warnings.append(f"Student already exists: {student_id}")
-                    continue
-
-                Student.objects.create(
-                    school=school,
-                    student_id=student_id,
-                    name=name,
-                    class_group=class_group,
-                    is_active=True,
-                )
-                created += 1
-
-            messages.success(request, f"Successfully imported {created} students.")
-            if skipped > 0:
-                messages.warning(request, f"{skipped} rows were skipped.")
-                for w in warnings[:10]:
-                    messages.warning(request, w)
-                if len(warnings) > 10:
-                    messages.warning(request, f"...and {len(warnings)-10} more skipped rows.")
+        # Large files are processed by a background worker; the page polls import_job_status.
+        job = ImportJob.objects.create(school=school, created_by=request.user, file=file)
+        transaction.on_commit(lambda: run_import_job.delay(job.pk, job.school_id))
+        messages.info(request, "Import started. You can follow its progress below.")
+        return redirect(f"{reverse('students:import_students')}?job={job.pk}")
 
-        except Exception as e:
-            messages.error(request, f"Error processing file: {str(e)}")
 
-        return redirect('students:librarian_dashboard')
+@login_required
+def import_job_status(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if not request.user.is_staff:
+        if not request.is_librarian or request.school is None or request.school.pk != job.school_id:
+            raise Http404
+    return JsonResponse(job.as_status())
 
 
-@login_required
+@librarian_required(message="Only librarians can return books.")
 def bulk_return(request):
-    if not request.user.school_profile.is_librarian:
-        messages.error(request, "Only librarians can return books.")
-        return redirect('students:librarian_dashboard')
-
     if request.method == 'POST':
         borrow_ids = request.POST.getlist('borrow_ids')
         if not borrow_ids:
             messages.warning(request, "No books selected for return.")
             return redirect('students:returns_list')
 
-        returned_count = 0
-        for borrow_id in borrow_ids:
-            try:
-                borrow = BorrowTransaction.objects.get(id=borrow_id, status__in=['ISSUED', 'OVERDUE'])
-                borrow.returned_date = timezone.now().date()
-                borrow.status = 'RETURNED'
-                borrow.save()
-
-                # Increase book availability
-                borrow.book.available = F('available') + 1
-                borrow.book.save(update_fields=['available'])
-
-                returned_count += 1
-            except BorrowTransaction.DoesNotExist:
-                continue
+        borrow_ids = [borrow_id for borrow_id in borrow_ids if borrow_id.isdigit()]
+        returned_count = len(return_loans(BorrowTransaction.objects.filter(
+            id__in=borrow_ids,
+            school=request.school,
+        )))
 
         if returned_count > 0:
             messages.success(request, f"Successfully returned {returned_count} book(s).")
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 IMPORT_EXPORT_USE_TRANSACTIONS = True
 IMPORT_EXPORT_SKIP_ADMIN_LOG = True
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config      # ← MUST be here – add this line if missing
 import os
 
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Your custom apps
     'schools',
@@ -47,16 +49,57 @@ INSTALLED_APPS = [
     # Third-party apps
     'import_export',
 ]
+
+# =====================================
+# Schema-per-school tenancy (schools.tenancy)
+# =====================================
+# Off: all schools share the public schema. On: each school's data lives in
+# its own schema, chosen by the request host (schools.SchoolDomain); move
+# existing schools first with `manage.py move_school_to_schema`.
+SCHOOL_TENANCY = config('SCHOOL_TENANCY', default=False, cast=bool)
+TENANT_MODEL = 'schools.School'
+TENANT_DOMAIN_MODEL = 'schools.SchoolDomain'
+SHARED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django.contrib.postgres',
+    'schools',  # split by model, see schools.routers
+    'core',
+    'import_export',
+]
+TENANT_APPS = [
+    'schools',
+    'students',
+    'books',
+    'transactions',
+]
+if SCHOOL_TENANCY:
+    INSTALLED_APPS.insert(0, 'django_tenants')
+    TENANT_SYNC_ROUTER = 'schools.routers.SchoolTenantRouter'
+    DATABASE_ROUTERS = [TENANT_SYNC_ROUTER]
+    # The main domain (login, admin for shared models, /metrics) has no school.
+    SHOW_PUBLIC_IF_NO_TENANT_FOUND = True
+    # Share the login between the main domain and the school hosts, e.g. '.techpulse.ug'.
+    SESSION_COOKIE_DOMAIN = config('SESSION_COOKIE_DOMAIN', default=None)
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MIDDLEWARE = [
+    'core.instrumentation.SQLInstrumentationMiddleware',  # no-op unless SQL_INSTRUMENTATION
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'schools.middleware.SchoolContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if SCHOOL_TENANCY:
+    MIDDLEWARE.insert(0, 'django_tenants.middleware.main.TenantMainMiddleware')
 
 ROOT_URLCONF = 'techpulse.urls'
 
@@ -143,9 +186,65 @@ STATIC_URL = '/static/'
 
 # This is the missing one - create this folder manually
 STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Uploaded files (school logos, background import files)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / "media"
 LOGIN_REDIRECT_URL = '/'  # redirect to home page after login
 # or
 LOGIN_REDIRECT_URL = '/dashboard/student/'  # redirect to student dashboard
 LOGIN_REDIRECT_URL = '/'  # redirect to home page after login
 # or
-# LOGIN_REDIRECT_URL = '/dashboard/student/'  # redirect to student dashboard (once we build it)
\ No newline at end of file
+# LOGIN_REDIRECT_URL = '/dashboard/student/'  # redirect to student dashboard (once we build it)
+
+# =====================================
+# Celery (background jobs)
+# =====================================
+CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+CELERY_TIMEZONE = TIME_ZONE
+# Run tasks inline (no worker needed) - handy for local development
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+
+CELERY_BEAT_SCHEDULE = {
+    'sweep-overdue-loans': {
+        'task': 'transactions.tasks.sweep_overdue_loans',
+        'schedule': crontab(hour=0, minute=15),
+    },
+}
+
+# =====================================
+# Cache (shared by all web and worker processes)
+# =====================================
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_CACHE_URL', default='redis://localhost:6379/1'),
+        'KEY_PREFIX': 'techpulse',
+    }
+}
+
+# =====================================
+# SQL / timing instrumentation (core.instrumentation)
+# =====================================
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', default=False, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=int)
+DUPLICATE_QUERY_THRESHOLD = config('DUPLICATE_QUERY_THRESHOLD', default=5, cast=int)
+
+# =====================================
+# Prometheus metrics at /metrics (core.metrics), aggregated in the cache
+# =====================================
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -3,8 +3,13 @@ from django.urls import path, include
 from django.views.generic import TemplateView
 from django.contrib.auth.views import LoginView, LogoutView
 
+from core.instrumentation import sql_instrumentation_summary
+from core.metrics import metrics_view
+
 urlpatterns = [
+    path('admin/sql-instrumentation/', sql_instrumentation_summary, name='sql_instrumentation_summary'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 
     # Authentication
     path('accounts/login/', LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -10,7 +10,7 @@ from django.urls import reverse_lazy
 def home(request):
     if request.user.is_authenticated:
         # Redirect based on role
-        if hasattr(request.user, 'school_profile') and request.user.school_profile.is_librarian:
+        if request.is_librarian:
             return redirect('librarian_dashboard')
         else:
             return redirect('student_dashboard')
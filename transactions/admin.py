@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
-from django.core.exceptions import ValidationError
 from django.shortcuts import render
 from django.urls import path
 from .models import BorrowTransaction
+from .services import renew_loans, return_loans, write_off_loans
+
+MAX_REJECTED_SHOWN = 50
 
 
 @admin.register(BorrowTransaction)
@@ -28,6 +30,7 @@ class BorrowTransactionAdmin(admin.ModelAdmin):
         'book__title',
         'book__isbn',
     )
+    list_select_related = ('student__class_group', 'student__school', 'book', 'issued_by')
     date_hierarchy = 'issued_date'
     readonly_fields = ('fine_amount', 'returned_date', 'renewal_count')
     actions = ['renew_transaction', 'mark_lost', 'mark_damaged', 'mark_returned']
@@ -62,82 +65,49 @@ class BorrowTransactionAdmin(admin.ModelAdmin):
         return "-"
     days_overdue_display.short_description = "Overdue"
 
+    def run_batch(self, request, queryset, operation, done_label, rejected_reason):
+        """
+        Apply a set-based circulation service to the selected loans and
+        report the outcome in one summary message instead of one per row.
+        """
+        selected = set(queryset.values_list('id', flat=True))
+        done = operation(BorrowTransaction.objects.filter(id__in=selected))
+        rejected = sorted(selected - set(done))
+        if rejected:
+            shown = ", ".join(f"#{pk}" for pk in rejected[:MAX_REJECTED_SHOWN])
+            if len(rejected) > MAX_REJECTED_SHOWN:
+                shown += f" and {len(rejected) - MAX_REJECTED_SHOWN} more"
+            self.message_user(request, f"Skipped {len(rejected)} transaction(s) ({rejected_reason}): {shown}", level='error')
+        if done:
+            self.message_user(request, f"Successfully {done_label} {len(done)} transaction(s).")
+
     @admin.action(description="Renew selected transactions (extend due date by 14 days)")
     def renew_transaction(self, request, queryset):
-        success_count = 0
-        for transaction in queryset:
-            try:
-                transaction.renew(days=14)
-                success_count += 1
-                self.message_user(request, f"Renewed: {transaction}")
-            except ValidationError as e:
-                self.message_user(request, f"Cannot renew {transaction}: {e}", level='error')
-        if success_count:
-            self.message_user(request, f"Successfully renewed {success_count} transaction(s).")
+        self.run_batch(request, queryset, lambda loans: renew_loans(loans, days=14),
+                       "renewed", "not issued or max renewals reached")
 
     @admin.action(description="Mark selected as Lost (reduce stock permanently)")
     def mark_lost(self, request, queryset):
-        success_count = 0
-        for transaction in queryset:
-            if transaction.status not in ['RETURNED', 'LOST', 'DAMAGED']:
-                transaction.status = 'LOST'
-                transaction.book.total_copies -= 1
-                transaction.book.available -= 1
-                transaction.book.save(update_fields=['total_copies', 'available'])
-                transaction.save()
-                success_count += 1
-                self.message_user(request, f"Marked as Lost: {transaction}")
-            else:
-                self.message_user(request, f"Cannot mark {transaction} as Lost (already finalized)", level='error')
-        if success_count:
-            self.message_user(request, f"Successfully marked {success_count} as Lost.")
+        self.run_batch(request, queryset, lambda loans: write_off_loans(loans, 'LOST'),
+                       "marked as Lost", "not issued or overdue")
 
     @admin.action(description="Mark selected as Damaged (reduce available copies)")
     def mark_damaged(self, request, queryset):
-        success_count = 0
-        for transaction in queryset:
-            if transaction.status not in ['RETURNED', 'LOST', 'DAMAGED']:
-                transaction.status = 'DAMAGED'
-                transaction.book.available -= 1
-                transaction.book.save(update_fields=['available'])
-                transaction.save()
-                success_count += 1
-                self.message_user(request, f"Marked as Damaged: {transaction}")
-            else:
-                self.message_user(request, f"Cannot mark {transaction} as Damaged (already finalized)", level='error')
-        if success_count:
-            self.message_user(request, f"Successfully marked {success_count} as Damaged.")
+        self.run_batch(request, queryset, lambda loans: write_off_loans(loans, 'DAMAGED'),
+                       "marked as Damaged", "not issued or overdue")
 
     @admin.action(description="Mark selected as Returned")
     def mark_returned(self, request, queryset):
-        success_count = 0
-        for transaction in queryset:
-            try:
-                if transaction.status in ['ISSUED', 'OVERDUE']:
-                    transaction.status = 'RETURNED'
-                    transaction.returned_date = timezone.now().date()
-                    transaction.fine_amount = transaction.calculate_fine()
-                    transaction.book.available += 1
-                    transaction.book.save(update_fields=['available'])
-                    transaction.save()
-                    success_count += 1
-                    self.message_user(request, f"Successfully returned: {transaction}")
-                else:
-                    raise ValidationError(f"Cannot return {transaction}: already {transaction.status.lower()}.")
-            except ValidationError as e:
-                self.message_user(request, f"Error returning {transaction}: {e}", level='error')
-        if success_count:
-            self.message_user(request, f"Successfully returned {success_count} transaction(s).")
+        self.run_batch(request, queryset, return_loans, "returned", "not issued or overdue")
 
     def overdue_report_view(self, request):
         today = timezone.now().date()
-        overdue = BorrowTransaction.objects.filter(
-            status__in=['ISSUED', 'OVERDUE'],
-            due_date__lt=today
-        ).select_related('student', 'book')
+        overdue = BorrowTransaction.objects.overdue(today).select_related(
+            'student__class_group', 'student__school', 'book'
+        )
 
         total_overdue = overdue.count()
-        total_fine = sum(t.calculate_fine() for t in overdue)
+        total_fine = overdue.fine_total(as_of=today)
 
         context = {
             'overdue': overdue,
@@ -0,0 +1,19 @@
+from django import forms
+
+from .models import BorrowTransaction
+
+
+class LoanExportForm(forms.Form):
+    date_from = forms.DateField(required=False, label="Issued from")
+    date_to = forms.DateField(required=False, label="Issued to")
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All statuses')] + BorrowTransaction.STATUS_CHOICES,
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        date_from, date_to = cleaned.get('date_from'), cleaned.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned
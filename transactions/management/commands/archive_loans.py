@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schools.tenancy import school_schema, tenant_schools
+from transactions.models import CLOSED_STATUSES, BorrowTransaction
+from transactions.services import LOAN_ARCHIVE_BATCH_SIZE, archive_closed_loans
+
+TERM_LENGTH = timedelta(weeks=13)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed loans (returned, lost, damaged, cancelled) issued more than N terms ago "
+        "to the archive table. They stay visible in student histories and exports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=4, help="Archive loans issued more than this many terms (13 weeks) ago.")
+        parser.add_argument('--before', help="Archive loans issued before this date (YYYY-MM-DD) instead.")
+        parser.add_argument('--batch-size', type=int, default=LOAN_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the loans that would be moved.")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = timezone.datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Invalid --before, expected YYYY-MM-DD.")
+        else:
+            if options['terms'] < 1:
+                raise CommandError("--terms must be at least 1.")
+            before = timezone.now().date() - options['terms'] * TERM_LENGTH
+
+        # One pass over the shared tables, or one per school schema with SCHOOL_TENANCY.
+        for school in tenant_schools():
+            prefix = f"{school.short_name}: " if school else ""
+            with school_schema(school):
+                if options['dry_run']:
+                    count = BorrowTransaction.objects.filter(status__in=CLOSED_STATUSES, issued_date__lt=before).count()
+                    self.stdout.write(f"{prefix}{count} closed loan(s) issued before {before} would be archived.")
+                    continue
+
+                moved = archive_closed_loans(before, batch_size=options['batch_size'])
+            if moved is None:
+                self.stdout.write(self.style.WARNING(f"{prefix}Another archive run is already in progress - skipped."))
+                continue
+            self.stdout.write(self.style.SUCCESS(f"{prefix}{moved} closed loan(s) issued before {before} archived."))
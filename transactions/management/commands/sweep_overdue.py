@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schools.tenancy import school_schema, tenant_schools
+from transactions.models import DEFAULT_DAILY_FINE
+from transactions.services import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = "Mark ISSUED loans past their due date as OVERDUE and refresh accrued fines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Sweep as of this date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--rate', type=int, default=DEFAULT_DAILY_FINE, help="Fine per day overdue (UGX).")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = timezone.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Invalid --date, expected YYYY-MM-DD.")
+
+        # One pass over the shared tables, or one per school schema with SCHOOL_TENANCY.
+        for school in tenant_schools():
+            prefix = f"{school.short_name}: " if school else ""
+            with school_schema(school):
+                result = sweep_overdue(as_of=as_of, daily_rate=options['rate'])
+            if result is None:
+                self.stdout.write(self.style.WARNING(f"{prefix}Another overdue sweep is already running - skipped."))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefix}{result['flipped']} loan(s) marked overdue, {result['fines_refreshed']} fine(s) refreshed."
+            ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_borrowtransaction_max_renewals_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['status', 'due_date'], name='transaction_status_43366c_idx'),
+        ),
+    ]
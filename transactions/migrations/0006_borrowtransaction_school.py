@@ -0,0 +1,65 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_book_school(apps, schema_editor):
+    BorrowTransaction = apps.get_model('transactions', 'BorrowTransaction')
+    Book = apps.get_model('books', 'Book')
+    BorrowTransaction.objects.filter(school__isnull=True).update(
+        school_id=Subquery(Book.objects.filter(pk=OuterRef('book_id')).values('school_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_school_category_school'),
+        ('schools', '0001_initial'),
+        ('transactions', '0005_borrowtransaction_status_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowtransaction',
+            name='school',
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='borrow_transactions',
+                to='schools.school',
+                verbose_name='School',
+            ),
+        ),
+        migrations.RunPython(copy_book_school, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='borrowtransaction',
+            name='school',
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='borrow_transactions',
+                to='schools.school',
+                verbose_name='School',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['school', 'status', 'due_date'], name='loan_school_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['school', 'issued_date'], name='loan_school_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(
+                condition=models.Q(('status__in', ('ISSUED', 'OVERDUE'))),
+                fields=['school', '-issued_date', 'id'],
+                name='loan_school_active_idx',
+            ),
+        ),
+    ]
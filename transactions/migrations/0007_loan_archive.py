@@ -0,0 +1,78 @@
+# Generated by Django 5.2.10 on 2026-10-17 07:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LOAN_HISTORY_COLUMNS = (
+    'id, student_id, book_id, school_id, issued_date, due_date, returned_date, status, '
+    'fine_amount, fine_paid, issued_by_id, notes, renewal_count, max_renewals'
+)
+
+CREATE_LOAN_HISTORY = f'''
+CREATE VIEW transactions_loanhistory AS
+SELECT {LOAN_HISTORY_COLUMNS}, FALSE AS archived FROM transactions_borrowtransaction
+UNION ALL
+SELECT {LOAN_HISTORY_COLUMNS}, TRUE AS archived FROM transactions_archivedborrowtransaction
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_school_title_index'),
+        ('schools', '0004_dailycirculation'),
+        ('students', '0007_student_school_name_index'),
+        ('transactions', '0006_borrowtransaction_school'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('issued_date', models.DateField()),
+                ('due_date', models.DateField()),
+                ('returned_date', models.DateField(null=True)),
+                ('status', models.CharField(choices=[('ISSUED', 'Issued'), ('OVERDUE', 'Overdue'), ('RETURNED', 'Returned'), ('LOST', 'Lost'), ('DAMAGED', 'Damaged'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('fine_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fine_paid', models.BooleanField()),
+                ('notes', models.TextField()),
+                ('renewal_count', models.PositiveIntegerField()),
+                ('max_renewals', models.PositiveIntegerField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'transactions_loanhistory',
+                'ordering': ['-issued_date'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBorrowTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('issued_date', models.DateField(verbose_name='Date Issued')),
+                ('due_date', models.DateField(verbose_name='Due Date')),
+                ('returned_date', models.DateField(blank=True, null=True, verbose_name='Date Returned')),
+                ('status', models.CharField(choices=[('ISSUED', 'Issued'), ('OVERDUE', 'Overdue'), ('RETURNED', 'Returned'), ('LOST', 'Lost'), ('DAMAGED', 'Damaged'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Status')),
+                ('fine_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Total Fine (UGX)')),
+                ('fine_paid', models.BooleanField(default=False, verbose_name='Fine Paid?')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('renewal_count', models.PositiveIntegerField(default=0, verbose_name='Renewal Count')),
+                ('max_renewals', models.PositiveIntegerField(default=2, verbose_name='Max Renewals Allowed')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived At')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='books.book', verbose_name='Book')),
+                ('issued_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Issued By')),
+                ('school', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='schools.school', verbose_name='School')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='students.student', verbose_name='Borrower')),
+            ],
+            options={
+                'verbose_name': 'Archived Borrow Transaction',
+                'verbose_name_plural': 'Archived Borrow Transactions',
+                'ordering': ['-issued_date'],
+                'indexes': [models.Index(fields=['school', 'issued_date'], name='archived_loan_school_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_LOAN_HISTORY, 'DROP VIEW transactions_loanhistory'),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Every school-scoped status/due-date lookup is served by loan_school_status_due_idx."""
+
+    dependencies = [
+        ('transactions', '0007_loan_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='borrowtransaction',
+            name='transaction_status_43366c_idx',
+        ),
+    ]
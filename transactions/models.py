@@ -1,11 +1,67 @@
 from django.db import models
+from django.db.models import Case, DateField, F, Func, IntegerField, Q, Sum, Value, When
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
 from books.models import Book
+from books.stock import release, reserve
+from core.metrics import LOANS_RENEWED
 from students.models import Student
 
+DEFAULT_DAILY_FINE = 1000  # UGX per day overdue
+ACTIVE_STATUSES = ('ISSUED', 'OVERDUE')
+
+
+class DaysBetween(Func):
+    """Whole days from `start` to `end` (end - start), computed in SQL."""
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST((julianday(%(expressions)s)) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+class BorrowTransactionQuerySet(models.QuerySet):
+    """
+    SQL counterparts of BorrowTransaction.is_overdue / days_overdue /
+    calculate_fine, so totals can be computed with one aggregate query.
+    Keep them in step with the Python methods.
+    """
+
+    def active(self):
+        return self.filter(status__in=ACTIVE_STATUSES)
+
+    def overdue(self, as_of=None):
+        as_of = as_of or timezone.now().date()
+        return self.active().filter(due_date__lt=as_of)
+
+    def with_days_overdue(self, as_of=None):
+        as_of = as_of or timezone.now().date()
+        return self.annotate(overdue_days=Case(
+            When(
+                Q(status__in=ACTIVE_STATUSES, due_date__lt=as_of),
+                then=DaysBetween(Value(as_of, output_field=DateField()), F('due_date')),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+
+    def with_fine(self, daily_rate=DEFAULT_DAILY_FINE, as_of=None):
+        return self.with_days_overdue(as_of).annotate(accrued_fine=F('overdue_days') * daily_rate)
+
+    def fine_total(self, daily_rate=DEFAULT_DAILY_FINE, as_of=None):
+        return self.with_fine(daily_rate, as_of).aggregate(total=Sum('accrued_fine'))['total'] or 0
+
 
 class BorrowTransaction(models.Model):
     STATUS_CHOICES = [
@@ -29,6 +85,17 @@ class BorrowTransaction(models.Model):
         related_name='borrow_transactions',
         verbose_name="Book"
     )
+    # Copy of book.school, set in save(), so circulation queries filter the
+    # loans table by school without joining books_book. Indexed by the
+    # composite indexes below, which all start with it.
+    school = models.ForeignKey(
+        'schools.School',
+        on_delete=models.CASCADE,
+        related_name='borrow_transactions',
+        editable=False,
+        db_index=False,
+        verbose_name="School"
+    )
     issued_date = models.DateField(default=timezone.now, verbose_name="Date Issued")
     due_date = models.DateField(verbose_name="Due Date")
     returned_date = models.DateField(null=True, blank=True, verbose_name="Date Returned")
@@ -40,6 +107,8 @@ class BorrowTransaction(models.Model):
     renewal_count = models.PositiveIntegerField(default=0, verbose_name="Renewal Count")
     max_renewals = models.PositiveIntegerField(default=2, verbose_name="Max Renewals Allowed")
 
+    objects = BorrowTransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-issued_date']
         verbose_name = "Borrow Transaction"
@@ -48,6 +117,15 @@ class BorrowTransaction(models.Model):
             models.Index(fields=['student', 'status']),
             models.Index(fields=['book', 'status']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['school', 'status', 'due_date'], name='loan_school_status_due_idx'),
+            models.Index(fields=['school', 'issued_date'], name='loan_school_issued_idx'),
+            # Active loans are a small share of the table; lists of them
+            # (returns, dashboard) page on (-issued_date, id).
+            models.Index(
+                fields=['school', '-issued_date', 'id'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='loan_school_active_idx',
+            ),
         ]
 
     def __str__(self):
@@ -61,39 +139,60 @@ class BorrowTransaction(models.Model):
                 raise ValidationError("Due date must be after issued date.")
 
     def save(self, *args, **kwargs):
+        # Stock moves through books.stock; loan_saved (schools.signals)
+        # accounts for it in the stats using _stock_delta.
+        self._stock_delta = 0
+        if self.school_id is None or self._meta.get_field('book').is_cached(self):
+            self.school_id = self.book.school_id
         if self.pk is None:
-            if self.book.available <= 0:
+            stock = reserve({self.book_id: 1})
+            if not stock:
                 raise ValidationError("No copies available to issue.")
-            self.book.available -= 1
-            self.book.save(update_fields=['available'])
+            self._stock_delta = -1
+            self._sync_book_stock(stock)
 
             if not self.due_date:
                 self.due_date = self.issued_date + timezone.timedelta(days=14)
 
         elif self.status == 'RETURNED' and self.returned_date is None:
             self.returned_date = timezone.now().date()
-            self.book.available += 1
-            self.book.save(update_fields=['available'])
-            self.fine_amount = self.calculate_fine()
+            stock = release({self.book_id: 1})
+            if stock:
+                self._stock_delta = 1
+                self._sync_book_stock(stock)
+            self._apply_return_fine()
 
         super().save(*args, **kwargs)
 
-    def is_overdue(self):
-        if self.status in ['RETURNED', 'LOST', 'DAMAGED', 'CANCELLED']:
+    def _sync_book_stock(self, stock):
+        if self._meta.get_field('book').is_cached(self):
+            self.book.available = stock[self.book_id]
+
+    def is_overdue(self, as_of=None):
+        if self.status not in ACTIVE_STATUSES:
             return False
         if self.due_date is None:
             return False
-        return timezone.now().date() > self.due_date
+        return (as_of or timezone.now().date()) > self.due_date
 
-    def days_overdue(self):
-        if not self.is_overdue() or self.due_date is None:
+    def days_overdue(self, as_of=None):
+        as_of = as_of or timezone.now().date()
+        if not self.is_overdue(as_of) or self.due_date is None:
             return 0
-        return (timezone.now().date() - self.due_date).days
+        return (as_of - self.due_date).days
 
-    def calculate_fine(self, daily_rate=1000):
-        if not self.is_overdue():
+    def calculate_fine(self, daily_rate=DEFAULT_DAILY_FINE, as_of=None):
+        if not self.is_overdue(as_of):
             return 0
-        return self.days_overdue() * daily_rate
+        return self.days_overdue(as_of) * daily_rate
+
+    def _apply_return_fine(self, daily_rate=DEFAULT_DAILY_FINE):
+        # Same rule as the fine expression in services.return_loans: a late
+        # return is charged for every day past due, an on-time one keeps
+        # whatever fine the loan already carries.
+        if self.due_date and self.due_date < self.returned_date:
+            self.fine_amount = (self.returned_date - self.due_date).days * daily_rate
+            self.fine_paid = False
 
     def can_renew(self):
         return self.status == 'ISSUED' and self.renewal_count < self.max_renewals
@@ -103,4 +202,82 @@ class BorrowTransaction(models.Model):
             raise ValidationError("Cannot renew this borrow (max renewals reached or not issued).")
         self.due_date += timezone.timedelta(days=days)
         self.renewal_count += 1
-        self.save()
\ No newline at end of file
+        self.save()
+        LOANS_RENEWED.inc()
+
+
+CLOSED_STATUSES = ('RETURNED', 'LOST', 'DAMAGED', 'CANCELLED')
+
+
+class ArchivedBorrowTransaction(models.Model):
+    """
+    Closed loan moved out of BorrowTransaction by archive_closed_loans()
+    (manage.py archive_loans). Keeps the loan's id and field values, so
+    the active table and its indexes only hold recent history. Read both
+    tiers through LoanHistory.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_loans', verbose_name="Borrower")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='archived_loans', verbose_name="Book")
+    school = models.ForeignKey(
+        'schools.School', on_delete=models.CASCADE, related_name='archived_loans', db_index=False, verbose_name="School"
+    )
+    issued_date = models.DateField(verbose_name="Date Issued")
+    due_date = models.DateField(verbose_name="Due Date")
+    returned_date = models.DateField(null=True, blank=True, verbose_name="Date Returned")
+    status = models.CharField(max_length=20, choices=BorrowTransaction.STATUS_CHOICES, verbose_name="Status")
+    fine_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="Total Fine (UGX)")
+    fine_paid = models.BooleanField(default=False, verbose_name="Fine Paid?")
+    issued_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Issued By")
+    notes = models.TextField(blank=True, verbose_name="Notes")
+    renewal_count = models.PositiveIntegerField(default=0, verbose_name="Renewal Count")
+    max_renewals = models.PositiveIntegerField(default=2, verbose_name="Max Renewals Allowed")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Archived At")
+
+    class Meta:
+        ordering = ['-issued_date']
+        verbose_name = "Archived Borrow Transaction"
+        verbose_name_plural = "Archived Borrow Transactions"
+        indexes = [
+            models.Index(fields=['school', 'issued_date'], name='archived_loan_school_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.book_id} ({self.status}, archived)"
+
+
+class LoanHistory(models.Model):
+    """
+    Read-only view over both tiers: BorrowTransaction UNION ALL
+    ArchivedBorrowTransaction (database view transactions_loanhistory,
+    created by migration 0007). Use it wherever the whole history of a
+    student or school is shown or exported; filters, ordering and
+    select_related work as on BorrowTransaction, and the database applies
+    them to each table with its own indexes.
+
+    A column added to the loan tables must also be added to the view.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.DO_NOTHING, db_constraint=False, related_name='loan_history')
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    school = models.ForeignKey('schools.School', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    issued_date = models.DateField()
+    due_date = models.DateField()
+    returned_date = models.DateField(null=True)
+    status = models.CharField(max_length=20, choices=BorrowTransaction.STATUS_CHOICES)
+    fine_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    fine_paid = models.BooleanField()
+    issued_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    notes = models.TextField()
+    renewal_count = models.PositiveIntegerField()
+    max_renewals = models.PositiveIntegerField()
+    archived = models.BooleanField()
+
+    objects = BorrowTransactionQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'transactions_loanhistory'
+        ordering = ['-issued_date']
@@ -0,0 +1,358 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, DateField, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from books.models import Book
+from books.stock import release, reserve, write_off
+from core.metrics import ISSUE_BATCH, LOANS_RENEWED, RETURN_BATCH
+from schools.generation import bump_school_generation
+from schools.stats import apply_deltas, apply_scope_deltas, loan_deltas, merge_deltas, record_circulation, record_issue
+from .models import CLOSED_STATUSES, DEFAULT_DAILY_FINE, ArchivedBorrowTransaction, BorrowTransaction, DaysBetween
+
+OVERDUE_SWEEP_LOCK_ID = 720_301  # arbitrary, unique per advisory lock in this project
+OVERDUE_SWEEP_BATCH_SIZE = 5000
+LOAN_ARCHIVE_LOCK_ID = 720_302
+LOAN_ARCHIVE_BATCH_SIZE = 5000
+
+
+def issue_books(student, quantities, due_date, issued_by=None):
+    """
+    Issue several books to one student in a single database transaction.
+
+    `quantities` maps book id -> number of copies requested. Only the
+    submitted books are read, stock is reserved for all of them with one
+    conditional UPDATE (books.stock.reserve) and all loans are inserted
+    with a single bulk_create, so the number of queries does not grow
+    with the number of books or copies.
+
+    Returns a tuple of (issued_total, warnings).
+    """
+    quantities = {book_id: qty for book_id, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return 0, []
+
+    today = timezone.now().date()
+    warnings = []
+
+    with transaction.atomic():
+        books = {book.id: book for book in Book.objects.filter(
+            school_id=student.school_id,
+            id__in=quantities.keys(),
+            available__gt=0,
+        ).only('id', 'title', 'available')}
+
+        wanted = {}
+        for book in books.values():
+            qty = quantities[book.id]
+            if qty > book.available:
+                warnings.append(f"Only {book.available} copy/copies of '{book.title}' available (requested {qty}).")
+                qty = book.available
+            wanted[book.id] = qty
+
+        reserved = reserve(wanted)
+        for book_id in wanted.keys() - reserved.keys():
+            warnings.append(f"'{books[book_id].title}' was issued elsewhere in the meantime - no copies reserved.")
+
+        loans = [
+            BorrowTransaction(
+                student=student,
+                book_id=book_id,
+                school_id=student.school_id,
+                issued_date=today,
+                due_date=due_date,
+                status='ISSUED',
+                issued_by=issued_by,
+            )
+            for book_id in reserved
+            for _ in range(wanted[book_id])
+        ]
+        BorrowTransaction.objects.bulk_create(loans)
+        record_issue(student.school_id, student.class_group_id, len(loans), today)
+        apply_deltas(student.school_id, available_copies=-len(loans))
+        ISSUE_BATCH.observe(len(loans))
+    bump_school_generation(student.school_id)
+
+    return len(loans), warnings
+
+
+def _add_stock_deltas(per_scope, groups, changed, per_book, stat, sign):
+    """
+    Add the school-level `stat` change for the copies of the books in
+    `changed` (a books.stock result) to `per_scope`.
+    """
+    for book_id, school_id in {(group['book_id'], group['school_id']) for group in groups}:
+        if book_id in changed:
+            scope = (school_id, None)
+            per_scope[scope] = merge_deltas(per_scope.get(scope, {}), {stat: sign * per_book[book_id]})
+
+
+def return_loans(loans, returned_date=None, daily_rate=DEFAULT_DAILY_FINE):
+    """
+    Mark every active loan in the `loans` queryset as RETURNED in a single
+    database transaction. Callers scope the queryset (e.g. to the
+    librarian's school); loans that are not ISSUED / OVERDUE are ignored.
+
+    The loans are updated with one UPDATE that computes the returned date,
+    status and late fine in SQL, and the copies go back to stock with one
+    conditional UPDATE (books.stock.release), so the number of queries
+    does not grow with the number of loans. Returns the ids of the loans
+    returned.
+    """
+    returned_date = returned_date or timezone.now().date()
+    late = Q(due_date__lt=returned_date)
+    fine = Case(
+        When(late, then=DaysBetween(Value(returned_date, output_field=DateField()), F('due_date')) * daily_rate),
+        default=F('fine_amount'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+    with transaction.atomic():
+        ids = list(loans.active().select_for_update(of=('self',)).values_list('id', flat=True))
+        if not ids:
+            return ids
+        batch = BorrowTransaction.objects.filter(id__in=ids)
+        groups = list(batch.values(
+            'book_id', 'school_id', 'student__class_group_id', 'status'
+        ).annotate(
+            n=Count('id'),
+            on_time=Count('id', filter=~late),
+            fines=Sum(fine),
+        ).order_by())
+
+        batch.update(
+            status='RETURNED',
+            returned_date=returned_date,
+            fine_amount=fine,
+            fine_paid=Case(When(late, then=Value(False)), default=F('fine_paid')),
+        )
+
+        per_book = {}
+        per_scope = {}
+        for group in groups:
+            n = group['n']
+            per_book[group['book_id']] = per_book.get(group['book_id'], 0) + n
+            scope = (group['school_id'], group['student__class_group_id'])
+            per_scope[scope] = merge_deltas(
+                per_scope.get(scope, {}),
+                {field: value * n for field, value in loan_deltas(group['status'], sign=-1).items()},
+                {'returned_loans': n, 'on_time_returns': group['on_time']},
+            )
+
+        released = release(per_book)
+        _add_stock_deltas(per_scope, groups, released, per_book, 'available_copies', 1)
+
+        # queryset.update() bypasses the stats signals.
+        apply_scope_deltas(per_scope)
+        per_school = {}
+        for group in groups:
+            returned, fines = per_school.get(group['school_id'], (0, 0))
+            per_school[group['school_id']] = (returned + group['n'], fines + (group['fines'] or 0))
+        for school_id, (returned, fines) in per_school.items():
+            record_circulation(school_id, returned_date, returned=returned, fines_accrued=fines)
+        bump_school_generation(*per_school)
+        RETURN_BATCH.observe(len(ids))
+
+    return ids
+
+
+def renew_loans(loans, days=14):
+    """
+    Extend the due date of every renewable loan in `loans` (ISSUED, under
+    its renewal limit, see BorrowTransaction.can_renew) by `days` with one
+    conditional UPDATE. Returns the ids of the renewed loans.
+    """
+    with transaction.atomic():
+        ids = list(loans.filter(
+            status='ISSUED', renewal_count__lt=F('max_renewals')
+        ).select_for_update(of=('self',)).values_list('id', flat=True))
+        BorrowTransaction.objects.filter(id__in=ids).update(
+            due_date=F('due_date') + timezone.timedelta(days=days),
+            renewal_count=F('renewal_count') + 1,
+        )
+        LOANS_RENEWED.inc(len(ids))
+    return ids
+
+
+def write_off_loans(loans, status):
+    """
+    Close every active loan in `loans` as LOST or DAMAGED in one
+    transaction. The copy on loan was already taken out of `available`
+    when it was issued; a lost copy is also removed from the book's
+    `total_copies` (books.stock.write_off). Returns the ids of the loans
+    written off.
+    """
+    if status not in ('LOST', 'DAMAGED'):
+        raise ValueError(f"Cannot write off a loan as {status}")
+
+    with transaction.atomic():
+        ids = list(loans.active().select_for_update(of=('self',)).values_list('id', flat=True))
+        if not ids:
+            return ids
+        batch = BorrowTransaction.objects.filter(id__in=ids)
+        groups = list(batch.values(
+            'book_id', 'school_id', 'student__class_group_id', 'status'
+        ).annotate(n=Count('id')).order_by())
+        batch.update(status=status)
+
+        per_book = {}
+        per_scope = {}
+        for group in groups:
+            n = group['n']
+            per_book[group['book_id']] = per_book.get(group['book_id'], 0) + n
+            scope = (group['school_id'], group['student__class_group_id'])
+            per_scope[scope] = merge_deltas(
+                per_scope.get(scope, {}),
+                {field: value * n for field, value in loan_deltas(group['status'], sign=-1).items()},
+            )
+
+        if status == 'LOST':
+            written_off = write_off(per_book)
+            _add_stock_deltas(per_scope, groups, written_off, per_book, 'total_copies', -1)
+
+        # queryset.update() bypasses the stats signals.
+        apply_scope_deltas(per_scope)
+        bump_school_generation(*{school_id for school_id, _ in per_scope})
+
+    return ids
+
+
+def parse_quantities(data, prefix='qty_'):
+    """
+    Extract {book_id: qty} from submitted form data (`qty_<book id>` keys).
+    Keys or values that are not integers are ignored.
+    """
+    quantities = {}
+    for key, value in data.items():
+        if not key.startswith(prefix):
+            continue
+        try:
+            book_id = int(key[len(prefix):])
+            qty = int(value)
+        except (TypeError, ValueError):
+            continue
+        if qty > 0:
+            quantities[book_id] = qty
+    return quantities
+
+
+@contextmanager
+def advisory_lock(lock_id):
+    """
+    Hold a Postgres session-level advisory lock for the duration of the block.
+    Yields False when another session already holds it. On other databases
+    (local development) the lock is a no-op.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+def sweep_overdue(as_of=None, daily_rate=DEFAULT_DAILY_FINE, batch_size=OVERDUE_SWEEP_BATCH_SIZE):
+    """
+    Flip ISSUED loans past their due date to OVERDUE and refresh the accrued
+    fine on every OVERDUE loan whose fine has changed, using set-based
+    UPDATEs. The schools of the refreshed loans get a new data generation,
+    so cached fine totals are rebuilt; the fines only reach
+    DailyCirculation.fines_accrued when the loans are returned.
+
+    Only one sweeper runs at a time across all workers (Postgres advisory
+    lock). Returns a dict with the number of loans flipped and fines
+    refreshed, or None if another sweeper holds the lock.
+    """
+    as_of = as_of or timezone.now().date()
+
+    with advisory_lock(OVERDUE_SWEEP_LOCK_ID) as acquired:
+        if not acquired:
+            return None
+
+        flipped = 0
+        newly_overdue = BorrowTransaction.objects.filter(status='ISSUED', due_date__lt=as_of)
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    newly_overdue.select_for_update(skip_locked=True, of=('self',))
+                    .order_by('due_date', 'id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                batch = BorrowTransaction.objects.filter(id__in=ids)
+                scopes = list(batch.values(
+                    'school_id', 'student__class_group_id', 'due_date'
+                ).annotate(n=Count('id')).order_by())
+                per_class = {}
+                per_day = {}
+                for scope in scopes:
+                    key = (scope['school_id'], scope['student__class_group_id'])
+                    per_class[key] = per_class.get(key, 0) + scope['n']
+                    # A loan becomes overdue the day after it was due, whenever the sweep runs.
+                    key = (scope['school_id'], scope['due_date'] + timezone.timedelta(days=1))
+                    per_day[key] = per_day.get(key, 0) + scope['n']
+                apply_scope_deltas({scope: {'overdue_loans': n} for scope, n in per_class.items()})
+                for (school_id, date), n in per_day.items():
+                    record_circulation(school_id, date, overdue_new=n)
+                bump_school_generation(*{school_id for school_id, _ in per_class})
+                flipped += batch.update(status='OVERDUE')
+
+        fine = DaysBetween(Value(as_of, output_field=DateField()), F('due_date')) * daily_rate
+        stale = BorrowTransaction.objects.filter(status='OVERDUE', due_date__lt=as_of).exclude(fine_amount=fine)
+        with transaction.atomic():
+            school_ids = list(stale.values_list('school_id', flat=True).distinct().order_by())
+            fines_refreshed = stale.update(fine_amount=fine)
+            bump_school_generation(*school_ids)
+
+    return {'flipped': flipped, 'fines_refreshed': fines_refreshed}
+
+
+def archive_closed_loans(before, batch_size=LOAN_ARCHIVE_BATCH_SIZE):
+    """
+    Move closed loans (CLOSED_STATUSES) issued before `before` from
+    BorrowTransaction to ArchivedBorrowTransaction, in id order, one
+    transaction per batch of `batch_size` (copy, then delete). The loans
+    keep their ids and stay visible through LoanHistory, which the stats
+    rebuilds also count from, so SchoolStats and DailyCirculation do not
+    change.
+
+    Only one archiver runs at a time across all workers (Postgres advisory
+    lock). Returns the number of loans moved, or None if another archiver
+    holds the lock.
+    """
+    fields = [field.attname for field in ArchivedBorrowTransaction._meta.concrete_fields if field.name != 'archived_at']
+    closed = BorrowTransaction.objects.filter(status__in=CLOSED_STATUSES, issued_date__lt=before)
+    table = connection.ops.quote_name(BorrowTransaction._meta.db_table)
+
+    with advisory_lock(LOAN_ARCHIVE_LOCK_ID) as acquired:
+        if not acquired:
+            return None
+
+        moved = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    closed.filter(id__gt=last_id).select_for_update(skip_locked=True, of=('self',))
+                    .order_by('id').values(*fields)[:batch_size]
+                )
+                if not rows:
+                    break
+                ArchivedBorrowTransaction.objects.bulk_create([ArchivedBorrowTransaction(**row) for row in rows])
+                ids = [row['id'] for row in rows]
+                # Raw DELETE: the loans are moving, not going away, so the
+                # stats signals of queryset.delete() must not fire.
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+                moved += len(ids)
+                last_id = ids[-1]
+
+    return moved
@@ -0,0 +1,14 @@
+from celery import shared_task
+
+from schools.tenancy import school_schema, tenant_schools
+from .services import sweep_overdue
+
+
+@shared_task(ignore_result=True)
+def sweep_overdue_loans():
+    """Celery beat entry point for the overdue sweeper (see CELERY_BEAT_SCHEDULE); one sweep per school schema."""
+    results = []
+    for school in tenant_schools():
+        with school_schema(school):
+            results.append(sweep_overdue())
+    return results[0] if len(results) == 1 else results
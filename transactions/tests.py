@@ -1,3 +1,227 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from books.models import Book
+from core.benchmark import QueryBudgetTestMixin
+from core.seeding import SCALES, seed_schools
+from students.models import Student
+from schools.generation import school_generation
+from schools.models import DailyCirculation, SchoolStats
+from schools.stats import rebuild_daily_circulation, rebuild_school_stats
+from students.reports import class_summaries
+from .exports import export_rows, loan_history
+from .models import ACTIVE_STATUSES, DEFAULT_DAILY_FINE, ArchivedBorrowTransaction, BorrowTransaction, LoanHistory
+from .services import archive_closed_loans, issue_books, return_loans, sweep_overdue
+
+
+class TransactionViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Loan history exports."""
+    target_prefixes = ('transactions:',)
+
+
+class OverdueReportAccessTests(TestCase):
+
+    def test_non_librarian_redirected(self):
+        user = get_user_model().objects.create_user('overdue-reader', password='x')
+        self.client.force_login(user)
+        response = self.client.get(reverse('transactions:overdue_report'))
+        self.assertRedirects(response, reverse('students:student_dashboard'), fetch_redirect_response=False)
+
+
+class LoanSchoolIndexTests(TestCase):
+    """The hot circulation queries filter on BorrowTransaction.school and use its indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, _)] = seed_schools(1, **SCALES['small'])
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE transactions_borrowtransaction')
+            if connection.vendor == 'postgresql':
+                # The seeded tables are small enough that a sequential scan
+                # would win; only the choice between the indexes is of interest.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_school_follows_book(self):
+        self.assertTrue(BorrowTransaction.objects.filter(school=self.school).exists())
+        self.assertFalse(BorrowTransaction.objects.exclude(school_id=F('book__school_id')).exists())
+
+    def test_overdue_uses_school_status_due_index(self):
+        self.assertUsesIndex(
+            BorrowTransaction.objects.filter(school=self.school, status='OVERDUE', due_date__lt=self.today),
+            'loan_school_status_due_idx',
+        )
+
+    def test_history_uses_school_issued_index(self):
+        self.assertUsesIndex(
+            BorrowTransaction.objects.filter(school=self.school, issued_date__gte=self.today - timedelta(days=30)),
+            'loan_school_issued_idx',
+        )
+
+    # SQLite only matches a partial index against literal values, not the
+    # bound parameters Django sends.
+    @skipUnless(connection.vendor == 'postgresql', "partial index matching needs PostgreSQL")
+    def test_active_list_uses_partial_index(self):
+        self.assertUsesIndex(
+            BorrowTransaction.objects.filter(
+                school=self.school, status__in=ACTIVE_STATUSES
+            ).order_by('-issued_date', 'id')[:25],
+            'loan_school_active_idx',
+        )
+
+
+class LoanArchiveTests(TestCase):
+    """Archiving moves closed loans between tables without changing what any reader sees."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, _)] = seed_schools(1, **SCALES['small'])
+        cls.before = timezone.localdate() - timedelta(days=60)
+
+    def snapshot(self):
+        rebuild_school_stats(self.school)
+        rebuild_daily_circulation(self.school)
+        stats = SchoolStats.objects.filter(school=self.school).values().get()
+        stats.pop('updated_at', None)
+        return {
+            'stats': stats,
+            'circulation': list(DailyCirculation.objects.filter(school=self.school).order_by('date').values_list(
+                'date', 'issued', 'returned', 'overdue_new', 'fines_accrued'
+            )),
+            'export': sorted(export_rows(loan_history(self.school))),
+            'classes': class_summaries(self.school),
+        }
+
+    def test_archive_closed_loans(self):
+        old_closed = BorrowTransaction.objects.filter(school=self.school, issued_date__lt=self.before).exclude(
+            status__in=ACTIVE_STATUSES
+        ).count()
+        self.assertGreater(old_closed, 0)
+        before = self.snapshot()
+
+        self.assertEqual(archive_closed_loans(self.before, batch_size=50), old_closed)
+
+        self.assertEqual(ArchivedBorrowTransaction.objects.count(), old_closed)
+        self.assertFalse(BorrowTransaction.objects.filter(id__in=ArchivedBorrowTransaction.objects.values('id')).exists())
+        self.assertEqual(LoanHistory.objects.filter(archived=True).count(), old_closed)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(archive_closed_loans(self.before), 0)
+
+
+class FineExpressionTests(TestCase):
+    """The SQL fine annotations agree with BorrowTransaction.days_overdue() / calculate_fine()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(school, _)] = seed_schools(1, classes=1, students_per_class=1, books=1, years=1, loans_per_student=0)
+        student = Student.objects.get(school=school)
+        book = Book.objects.get(school=school)
+        cls.today = timezone.localdate()
+        day = timedelta(days=1)
+        loans = BorrowTransaction.objects.bulk_create([
+            BorrowTransaction(student=student, book=book, school=school, status=status,
+                              issued_date=due - 14 * day, due_date=due, returned_date=returned)
+            for status, due, returned in [
+                ('ISSUED', cls.today + 7 * day, None),
+                ('ISSUED', cls.today, None),
+                ('ISSUED', cls.today - 3 * day, None),  # not swept yet
+                ('OVERDUE', cls.today - 1 * day, None),
+                ('OVERDUE', cls.today - 40 * day, None),
+                ('RETURNED', cls.today - 20 * day, cls.today - 2 * day),
+                ('LOST', cls.today - 30 * day, None),
+            ]
+        ])
+        cls.loan_ids = [loan.pk for loan in loans]
+
+    def test_sql_matches_python(self):
+        loans = BorrowTransaction.objects.filter(pk__in=self.loan_ids)
+        for as_of in (self.today - timedelta(days=10), self.today, self.today + timedelta(days=5)):
+            for daily_rate in (DEFAULT_DAILY_FINE, 250):
+                with self.subTest(as_of=as_of, daily_rate=daily_rate):
+                    expected_total = 0
+                    for loan in loans.with_fine(daily_rate, as_of):
+                        fine = loan.calculate_fine(daily_rate, as_of)
+                        self.assertEqual(loan.overdue_days, loan.days_overdue(as_of), loan.status)
+                        self.assertEqual(loan.accrued_fine, fine, loan.status)
+                        expected_total += fine
+                    self.assertGreater(expected_total, 0)
+                    self.assertEqual(loans.fine_total(daily_rate, as_of), expected_total)
+
+    def test_save_and_return_loans_record_same_fine(self):
+        loans = list(BorrowTransaction.objects.filter(pk__in=self.loan_ids).active().order_by('pk'))
+        Book.objects.filter(pk=loans[0].book_id).update(available=0)
+        twins = BorrowTransaction.objects.bulk_create([
+            BorrowTransaction(student=loan.student, book=loan.book, school=loan.school, status=loan.status,
+                              issued_date=loan.issued_date, due_date=loan.due_date, fine_amount=500)
+            for loan in loans
+        ])
+        return_loans(BorrowTransaction.objects.filter(pk__in=[twin.pk for twin in twins]))
+        for loan, twin in zip(loans, twins):
+            loan.fine_amount = 500
+            loan.status = 'RETURNED'
+            loan.save()
+            loan.refresh_from_db()
+            twin.refresh_from_db()
+            self.assertEqual((loan.fine_amount, loan.fine_paid), (twin.fine_amount, twin.fine_paid), loan.due_date)
+
+
+class IssueBooksQueryTests(TestCase):
+    """issue_books() makes the same number of queries however many copies it issues."""
+
+    @classmethod
+    def setUpTestData(cls):
+        [(cls.school, _)] = seed_schools(1, classes=1, students_per_class=2, books=1, years=1, loans_per_student=0)
+        cls.student = Student.objects.filter(school=cls.school).first()
+        cls.book = Book.objects.create(
+            title='Class Set', author='Anon', school=cls.school, total_copies=50, available=50,
+            category=Book.objects.filter(school=cls.school).first().category,
+        )
+
+    def issued_queries(self, copies):
+        due = timezone.localdate() + timedelta(days=14)
+        with CaptureQueriesContext(connection) as queries:
+            issued, warnings = issue_books(self.student, {self.book.pk: copies}, due)
+        self.assertEqual((issued, warnings), (copies, []))
+        return len(queries)
+
+    def test_queries_constant_in_copies(self):
+        self.issued_queries(1)  # first issue of the day creates the rollup rows
+        self.assertEqual(self.issued_queries(1), self.issued_queries(30))
+
+
+class OverdueSweepTests(TestCase):
+    """The sweep's fine refresh invalidates the fragment caches of the schools it touched."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.schools = [school for school, _ in seed_schools(2, **SCALES['small'])]
+
+    def test_fine_refresh_bumps_generation(self):
+        # Past every seeded due date: the next sweep only refreshes fines.
+        as_of = timezone.localdate() + timedelta(days=30)
+        sweep_overdue(as_of=as_of)
+        BorrowTransaction.objects.filter(school=self.schools[1]).update(status='RETURNED')
+        before = [school_generation(school.pk) for school in self.schools]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep_overdue(as_of=as_of + timedelta(days=1))
+        self.assertEqual(result['flipped'], 0)
+        self.assertGreater(result['fines_refreshed'], 0)
+        self.assertNotEqual(school_generation(self.schools[0].pk), before[0])
+        self.assertEqual(school_generation(self.schools[1].pk), before[1])
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_overdue(as_of=as_of + timedelta(days=1))['fines_refreshed'], 0)
@@ -5,5 +5,6 @@ app_name = 'transactions'
 
 urlpatterns = [
     path('overdue-report/', views.overdue_report, name='overdue_report'),
+    path('export/loans.<str:fmt>', views.export_loans, name='export_loans'),
     # Add more transaction URLs here later (issue, return, etc.)
 ]
\ No newline at end of file
@@ -1,18 +1,26 @@
 from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.utils import timezone
+from schools.decorators import librarian_required
+from .exports import csv_stream, export_rows, loan_history, xlsx_stream
+from .forms import LoanExportForm
 from .models import BorrowTransaction
 
-@login_required
+EXPORT_FORMATS = {
+    'csv': (csv_stream, 'text/csv'),
+    'xlsx': (xlsx_stream, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+@librarian_required
 def overdue_report(request):
     today = timezone.now().date()
-    overdue = BorrowTransaction.objects.filter(
-        status__in=['ISSUED', 'OVERDUE'],
-        due_date__lt=today
-    ).select_related('student', 'book').order_by('due_date')
+    overdue = (
+        BorrowTransaction.objects.overdue(today).filter(school=request.school)
+        .select_related('student', 'book').order_by('due_date')
+    )
 
     total_overdue = overdue.count()
-    total_fine = sum(transaction.calculate_fine() for transaction in overdue)
+    total_fine = overdue.fine_total(as_of=today)
 
     context = {
         'overdue': overdue,
@@ -20,4 +28,24 @@ def overdue_report(request):
         'total_fine': total_fine,
         'title': 'Overdue Borrow Report',
     }
-    return render(request, 'transactions/overdue_report.html', context)
\ No newline at end of file
+    return render(request, 'transactions/overdue_report.html', context)
+
+
+@librarian_required
+def export_loans(request, fmt):
+    """
+    Download the school's loan history as CSV or XLSX, filtered by
+    ?date_from=&date_to= (issued date) and ?status=, streamed in batches.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    form = LoanExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    stream, content_type = EXPORT_FORMATS[fmt]
+    loans = loan_history(request.school, **form.cleaned_data)
+    response = StreamingHttpResponse(stream(export_rows(loans)), content_type=content_type)
+    filename = f"loans-{request.school.short_name}-{timezone.now():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response